@@ -9,6 +9,10 @@ import json
 import re
 import google.generativeai as genai
 
+from fix_pipeline import DEFAULT_FILE, cache_get, cache_key, cache_put, run_parallel
+
+MODEL_NAME = 'gemini-2.5-flash'
+
 def load_fix_suggestions():
     """Load fix suggestions from file"""
     try:
@@ -25,13 +29,21 @@ def load_file_content(filepath='index.html'):
             return f.read()
     except Exception as e:
         print(f"Error loading file: {e}", file=sys.stderr)
-        sys.exit(1)
+        return None
 
 def apply_fixes_with_ai(api_key, suggestions, file_content):
-    """Use Gemini to apply fixes to the actual file"""
+    """Use Gemini to apply fixes to the actual file
+
+    The fixed file is cached by the hash of the file and its suggestions,
+    so re-running on an unchanged file does not call the API again.
+    """
+    key = cache_key(MODEL_NAME, file_content, suggestions)
+    cached = cache_get('applied', key)
+    if cached is not None:
+        return cached
     
     genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    model = genai.GenerativeModel(MODEL_NAME)
     
     prompt = f"""以下の修正提案を、実際のHTMLファイルに適用してください。
 
@@ -61,11 +73,13 @@ def apply_fixes_with_ai(api_key, suggestions, file_content):
         match = re.search(r'```html\n(.*?)\n```', text, re.DOTALL)
         
         if match:
-            return match.group(1)
+            fixed = match.group(1)
         else:
             # If no code block, try to use the whole response
             print("Warning: No code block found in response, using full text", file=sys.stderr)
-            return text
+            fixed = text
+        cache_put('applied', key, fixed)
+        return fixed
             
     except Exception as e:
         print(f"Error applying fixes: {e}", file=sys.stderr)
@@ -96,24 +110,34 @@ def main():
         print("No fixes to apply")
         return
     
-    suggestions = fix_data.get('suggestions', '')
+    # Per-file suggestions; older reports only have a single 'suggestions'
+    files = {
+        filepath: file_result['suggestions']
+        for filepath, file_result in fix_data.get('files', {}).items()
+    } or {DEFAULT_FILE: fix_data.get('suggestions', '')}
     
-    # Load current file
-    file_content = load_file_content()
+    def process(item):
+        filepath, suggestions = item
+        file_content = load_file_content(filepath)
+        if file_content is None:
+            return False
+        fixed_content = apply_fixes_with_ai(api_key, suggestions, file_content)
+        if not fixed_content:
+            print(f"❌ Failed to generate fixes for {filepath}", file=sys.stderr)
+            return False
+        if fixed_content == file_content:
+            print(f"No changes for {filepath}")
+            return True
+        return save_file(filepath, fixed_content)
     
-    # Apply fixes using AI
-    print("Applying fixes with AI...")
-    fixed_content = apply_fixes_with_ai(api_key, suggestions, file_content)
+    # Apply fixes using AI, all files concurrently
+    print(f"Applying fixes with AI to {len(files)} file(s)...")
+    results = run_parallel(process, files.items())
     
-    if fixed_content:
-        # Save fixed file
-        if save_file('index.html', fixed_content):
-            print("✅ Fixes applied successfully!")
-        else:
-            print("❌ Failed to save fixes", file=sys.stderr)
-            sys.exit(1)
+    if all(results):
+        print("✅ Fixes applied successfully!")
     else:
-        print("❌ Failed to generate fixes", file=sys.stderr)
+        print("❌ Failed to apply some fixes", file=sys.stderr)
         sys.exit(1)
 
 if __name__ == '__main__':
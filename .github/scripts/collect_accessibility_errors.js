@@ -1,4 +1,5 @@
 const fs = require('fs');
+const path = require('path');
 
 /**
  * Collect accessibility errors from axe-core report
@@ -7,16 +8,28 @@ const fs = require('fs');
 
 const REPORT_FILE = process.argv[2] || 'accessibility-report.json';
 const OUTPUT_FILE = process.argv[3] || 'accessibility_errors.json';
+// File the errors belong to when the report's URL does not name one
+const TARGET_FILE = process.argv[4] || null;
 
 try {
-    // Read axe-core report
-    const report = JSON.parse(fs.readFileSync(REPORT_FILE, 'utf8'));
+    // Read axe-core report (@axe-core/cli writes one result per page)
+    const parsed = JSON.parse(fs.readFileSync(REPORT_FILE, 'utf8'));
+    const reports = Array.isArray(parsed) ? parsed : [parsed];
 
     const errors = [];
     let success = true;
+    let totalViolations = 0;
+    let totalPasses = 0;
 
-    // Process violations
-    if (report.violations && report.violations.length > 0) {
+    reports.forEach(report => {
+        const file = fileFromUrl(report.url) || TARGET_FILE;
+        totalViolations += report.violations ? report.violations.length : 0;
+        totalPasses += report.passes ? report.passes.length : 0;
+
+        // Process violations
+        if (!report.violations || report.violations.length === 0) {
+            return;
+        }
         success = false;
 
         report.violations.forEach(violation => {
@@ -31,18 +44,19 @@ try {
                     target: node.target,
                     failureSummary: node.failureSummary,
                     // Extract line number if available in target
-                    line: extractLineNumber(node.target)
+                    line: extractLineNumber(node.target),
+                    file: file
                 });
             });
         });
-    }
+    });
 
     const result = {
         test_type: 'accessibility',
         errors: errors,
         success: success,
-        total_violations: report.violations ? report.violations.length : 0,
-        total_passes: report.passes ? report.passes.length : 0,
+        total_violations: totalViolations,
+        total_passes: totalPasses,
         wcag_level: 'AA'
     };
 
@@ -64,6 +78,27 @@ try {
     process.exit(0);
 }
 
+function fileFromUrl(url) {
+    // Page URL -> file path relative to the working directory; a served
+    // page maps to its URL path, "/" to index.html
+    if (!url) {
+        return null;
+    }
+    try {
+        const parsed = new URL(url);
+        const pathname = decodeURIComponent(parsed.pathname);
+        if (parsed.protocol === 'file:') {
+            return path.relative(process.cwd(), pathname);
+        }
+        const relative = pathname.replace(/^\/+/, '');
+        return relative === '' || relative.endsWith('/')
+            ? relative + 'index.html'
+            : relative;
+    } catch (error) {
+        return null;
+    }
+}
+
 function extractLineNumber(target) {
     // Try to extract line number from target selector if available
     // This is a best-effort approach
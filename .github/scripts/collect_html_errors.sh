@@ -5,6 +5,8 @@ set -euo pipefail
 
 ERROR_FILE="${1:-html_errors.json}"
 VNU_OUTPUT="${2:-vnu_output.txt}"
+# File the errors belong to when vnu's output does not name one
+TARGET_FILE="${3:-}"
 
 if [ ! -f "$VNU_OUTPUT" ]; then
   echo '{"test_type":"html_validation","errors":[],"success":true}' > "$ERROR_FILE"
@@ -12,13 +14,28 @@ if [ ! -f "$VNU_OUTPUT" ]; then
 fi
 
 # Parse vnu output and convert to JSON
-python3 - <<'EOF'
+python3 - "$VNU_OUTPUT" "$ERROR_FILE" "$TARGET_FILE" <<'EOF'
 import json
+import os
 import sys
 import re
+from urllib.parse import unquote, urlparse
 
 errors = []
 success = True
+target_file = sys.argv[3] or None
+
+
+def source_file(line):
+    """Path of a vnu '"file:/.../x.html":3.1-3.9: ...' line, relative to cwd"""
+    match = re.match(r'"([^"]+)":', line)
+    if not match:
+        return None
+    url = urlparse(match.group(1))
+    if url.scheme not in ('', 'file'):
+        return None
+    return os.path.relpath(unquote(url.path))
+
 
 try:
     with open(sys.argv[1], 'r') as f:
@@ -29,6 +46,8 @@ try:
     pattern = r'(Error|Warning):\s*(.+?)\.\s*(?:From line (\d+)(?:, column (\d+))?)?'
     
     for match in re.finditer(pattern, content, re.MULTILINE):
+        line_start = content.rfind('\n', 0, match.start()) + 1
+        path = source_file(content[line_start:]) or target_file
         severity = match.group(1).lower()
         message = match.group(2)
         line = int(match.group(3)) if match.group(3) else None
@@ -41,7 +60,8 @@ try:
             'severity': severity,
             'message': message,
             'line': line,
-            'column': column
+            'column': column,
+            'file': path
         })
 
 except Exception as e:
@@ -60,5 +80,3 @@ with open(sys.argv[2], 'w') as f:
 
 print(f"Collected {len(errors)} validation issues")
 EOF
-
-python3 - "$VNU_OUTPUT" "$ERROR_FILE"
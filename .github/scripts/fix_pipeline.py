@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the AI fix scripts: per-file error grouping, error-line
+context extraction, an on-disk result cache and a bounded worker pool.
+
+The cache lives in FIX_CACHE_DIR on the machine running the scripts. No
+workflow runs them or restores that directory, so it only saves calls on
+repeated local runs.
+"""
+
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_FILE = 'index.html'
+CACHE_DIR = os.environ.get('FIX_CACHE_DIR', '.fix_cache')
+MAX_WORKERS = int(os.environ.get('FIX_MAX_WORKERS', '4'))
+CONTEXT_LINES = int(os.environ.get('FIX_CONTEXT_LINES', '15'))
+# Used when no error can be tied to a line
+HEAD_LINES = 100
+
+# Bump when prompts change so stale cache entries are not reused
+CACHE_VERSION = '1'
+
+
+def default_files():
+    """Files the fix scripts target (FIX_TARGET_FILES)"""
+    files = os.environ.get('FIX_TARGET_FILES', DEFAULT_FILE)
+    return [f.strip() for f in files.split(',') if f.strip()]
+
+
+def group_errors_by_file(errors):
+    """Split {'html': {...}, 'accessibility': {...}} reports per target file
+
+    Errors carry the file they came from in 'file'. One without it is only
+    attributed when there is a single target file; otherwise it is skipped,
+    since its line numbers could belong to any of them.
+    """
+    grouped = {}
+    targets = default_files()
+    fallback = targets[0] if len(targets) == 1 else None
+    skipped = 0
+    for kind in ('html', 'accessibility'):
+        for error in errors[kind].get('errors', []):
+            path = error.get('file') or fallback
+            if not path:
+                skipped += 1
+                continue
+            per_file = grouped.setdefault(path, {'html': [], 'accessibility': []})
+            per_file[kind].append(error)
+    if skipped:
+        print(f"Skipping {skipped} error(s) without a file", file=sys.stderr)
+    return grouped
+
+
+def load_file_content(filepath):
+    """Load a file, or None when it cannot be read"""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def error_lines(file_errors, file_content):
+    """Line numbers (1-based) the errors point at
+
+    Accessibility errors rarely carry a line, so their offending HTML
+    snippet is looked up in the file instead.
+    """
+    lines = set()
+    for kind in ('html', 'accessibility'):
+        for error in file_errors[kind]:
+            if error.get('line'):
+                lines.add(int(error['line']))
+                continue
+            snippet = (error.get('html') or '').strip()[:80]
+            index = file_content.find(snippet) if snippet else -1
+            if index >= 0:
+                lines.add(file_content.count('\n', 0, index) + 1)
+    return sorted(lines)
+
+
+def context_excerpt(file_content, lines, radius=CONTEXT_LINES):
+    """Numbered excerpt of the regions around the given lines
+
+    Overlapping regions are merged; without any line the head of the file is
+    used, as before.
+    """
+    all_lines = file_content.split('\n')
+    if not lines:
+        ranges = [(1, min(HEAD_LINES, len(all_lines)))]
+    else:
+        ranges = []
+        for line in lines:
+            start, end = max(1, line - radius), min(len(all_lines), line + radius)
+            if ranges and start <= ranges[-1][1] + 1:
+                ranges[-1] = (ranges[-1][0], max(end, ranges[-1][1]))
+            else:
+                ranges.append((start, end))
+
+    chunks = []
+    for start, end in ranges:
+        chunks.append('\n'.join(
+            f'{n:>5}: {all_lines[n - 1]}' for n in range(start, end + 1)
+        ))
+    return '\n...\n'.join(chunks)
+
+
+def cache_key(*parts):
+    """Content hash of everything that determines a model response"""
+    digest = hashlib.sha256(CACHE_VERSION.encode())
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True, ensure_ascii=False)
+        digest.update(b'\0' + part.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cache_get(namespace, key):
+    """Cached value, or None"""
+    path = os.path.join(CACHE_DIR, namespace, f'{key}.json')
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)['value']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def cache_put(namespace, key, value):
+    """Store a value; written atomically so parallel jobs never see halves"""
+    directory = os.path.join(CACHE_DIR, namespace)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{key}.json')
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'value': value}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def run_parallel(fn, items, max_workers=MAX_WORKERS):
+    """Map fn over items with a bounded thread pool, keeping input order"""
+    items = list(items)
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(fn, items))
@@ -8,6 +8,19 @@ import sys
 import json
 import google.generativeai as genai
 
+from fix_pipeline import (
+    cache_get,
+    cache_key,
+    cache_put,
+    context_excerpt,
+    error_lines,
+    group_errors_by_file,
+    load_file_content,
+    run_parallel,
+)
+
+MODEL_NAME = 'gemini-2.5-flash'
+
 def load_error_reports():
     """Load all error reports"""
     errors = {
@@ -27,15 +40,7 @@ def load_error_reports():
     
     return errors
 
-def load_file_content(filepath='index.html'):
-    """Load the file that needs fixing"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return f.read()
-    except Exception as e:
-        return f"Error loading file: {e}"
-
-def generate_fix_prompt(errors, file_content):
+def generate_fix_prompt(errors, excerpt, filepath='index.html'):
     """Generate prompt for Gemini API"""
     
     prompt = """あなたはHTML、CSS、アクセシビリティの専門家です。
@@ -46,30 +51,29 @@ def generate_fix_prompt(errors, file_content):
 """
     
     # Add HTML validation errors
-    if errors['html'].get('errors'):
+    if errors['html']:
         prompt += "### HTMLバリデーションエラー\n\n"
-        for i, error in enumerate(errors['html']['errors'][:5], 1):  # Limit to 5 errors
+        for i, error in enumerate(errors['html'][:5], 1):  # Limit to 5 errors
             prompt += f"{i}. **{error['severity'].upper()}** (行 {error.get('line', '?')})\n"
             prompt += f"   - {error['message']}\n\n"
     
     # Add accessibility errors
-    if errors['accessibility'].get('errors'):
+    if errors['accessibility']:
         prompt += "### アクセシビリティエラー\n\n"
-        for i, error in enumerate(errors['accessibility']['errors'][:5], 1):  # Limit to 5 errors
+        for i, error in enumerate(errors['accessibility'][:5], 1):  # Limit to 5 errors
             prompt += f"{i}. **{error['impact'].upper()}** - {error['id']}\n"
             prompt += f"   - {error['description']}\n"
             prompt += f"   - 該当要素: `{error['html'][:100]}...`\n"
             prompt += f"   - 詳細: {error['helpUrl']}\n\n"
     
-    prompt += """
-## 現在のファイル（抜粋）
+    prompt += f"""
+## 現在のファイル（{filepath} のエラー行周辺の抜粋、行番号付き）
 
 ```html
 """
     
-    # Add relevant file sections (first 100 lines for context)
-    lines = file_content.split('\n')[:100]
-    prompt += '\n'.join(lines)
+    # Add only the regions around the reported lines
+    prompt += excerpt
     prompt += """
 ```
 
@@ -107,22 +111,33 @@ def generate_fix_prompt(errors, file_content):
     
     return prompt
 
-def generate_fixes(api_key, errors, file_content):
-    """Generate fix suggestions using Gemini API"""
+def generate_fixes(api_key, errors, file_content, filepath='index.html'):
+    """Generate fix suggestions using Gemini API
+
+    Returns (suggestions, cached). Responses are cached on disk by the hash
+    of the file content and its error report, so unchanged files cost
+    nothing on the next run.
+    """
+    key = cache_key(MODEL_NAME, file_content, errors)
+    cached = cache_get('suggestions', key)
+    if cached is not None:
+        return cached, True
     
     # Configure Gemini
     genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    model = genai.GenerativeModel(MODEL_NAME)
     
     # Generate prompt
-    prompt = generate_fix_prompt(errors, file_content)
+    excerpt = context_excerpt(file_content, error_lines(errors, file_content))
+    prompt = generate_fix_prompt(errors, excerpt, filepath)
     
     # Generate response
     try:
         response = model.generate_content(prompt)
-        return response.text
     except Exception as e:
-        return f"Error generating fixes: {e}"
+        return f"Error generating fixes: {e}", False
+    cache_put('suggestions', key, response.text)
+    return response.text, False
 
 def main():
     # Get API key
@@ -149,16 +164,34 @@ def main():
         print(json.dumps(result))
         return
     
-    # Load file content
-    file_content = load_file_content()
+    def process(item):
+        filepath, file_errors = item
+        file_content = load_file_content(filepath)
+        if file_content is None:
+            print(f"Skipping unreadable file: {filepath}", file=sys.stderr)
+            return filepath, None
+        suggestions, cached = generate_fixes(api_key, file_errors, file_content, filepath)
+        return filepath, {
+            'suggestions': suggestions,
+            'cached': cached,
+            'error_count': len(file_errors['html']) + len(file_errors['accessibility'])
+        }
     
-    # Generate fixes
-    fix_suggestions = generate_fixes(api_key, errors, file_content)
+    # Generate fixes for every affected file concurrently
+    files = {
+        filepath: file_result
+        for filepath, file_result in run_parallel(process, group_errors_by_file(errors).items())
+        if file_result is not None
+    }
     
     # Output result
     result = {
-        'has_fixes': True,
-        'suggestions': fix_suggestions,
+        'has_fixes': bool(files),
+        'suggestions': '\n\n'.join(
+            f"## {filepath}\n\n{file_result['suggestions']}"
+            for filepath, file_result in files.items()
+        ),
+        'files': files,
         'error_summary': {
             'html_errors': len(errors['html'].get('errors', [])),
             'accessibility_errors': len(errors['accessibility'].get('errors', []))
@@ -0,0 +1,90 @@
+"""Admin-only introspection endpoints under ``/admin``.
+
+Disabled (404) unless ``ADMIN_TOKEN`` is set; requests must then send it in
+the ``X-Admin-Token`` header. Under ``serve.py`` each request reaches one
+worker, identified by ``pid`` in the responses.
+
+- ``POST /admin/profile?seconds=10``: CPU profile, collapsed stacks
+  (``curl ... | flamegraph.pl > cpu.svg``)
+- ``POST /admin/tracemalloc/start?frames=1`` / ``.../stop``
+- ``POST /admin/tracemalloc/snapshot?limit=25``: top allocations, plus the
+  diff against the previous snapshot
+- ``GET /admin/sessions``: live ``/ws`` sessions with queue depths and bytes
+"""
+
+import asyncio
+import hmac
+import logging
+import os
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from live_session import session_registry
+from profiler import collapsed, heap_tracer, sampling_profiler
+
+logger = logging.getLogger(__name__)
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+MAX_PROFILE_SECONDS = 120
+
+
+def require_admin(x_admin_token: str | None = Header(None)) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404)
+    # Compared as bytes: compare_digest rejects non-ASCII str with TypeError
+    if not x_admin_token or not hmac.compare_digest(
+        x_admin_token.encode(), ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10.0, gt=0, le=MAX_PROFILE_SECONDS),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+):
+    logger.info("CPU profile started", extra={"seconds": seconds})
+    try:
+        stacks, samples = await asyncio.to_thread(
+            sampling_profiler.profile, seconds, interval_ms / 1000
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(
+        collapsed(stacks),
+        headers={"X-Samples": str(samples), "X-Pid": str(os.getpid())},
+    )
+
+
+@router.post("/tracemalloc/start")
+async def tracemalloc_start(frames: int = Query(1, ge=1, le=64)):
+    heap_tracer.start(frames)
+    logger.info("tracemalloc started", extra={"frames": frames})
+    return {"pid": os.getpid(), "tracing": True}
+
+
+@router.post("/tracemalloc/stop")
+async def tracemalloc_stop():
+    heap_tracer.stop()
+    return {"pid": os.getpid(), "tracing": False}
+
+
+@router.post("/tracemalloc/snapshot")
+async def tracemalloc_snapshot(
+    limit: int = Query(25, ge=1, le=500),
+    key: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+):
+    try:
+        result = await asyncio.to_thread(heap_tracer.snapshot, limit, key)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"pid": os.getpid(), **result}
+
+
+@router.get("/sessions")
+async def sessions():
+    return {"pid": os.getpid(), "sessions": session_registry.snapshot()}
@@ -0,0 +1,64 @@
+"""PCM helpers shared by the Live relay and the TTS endpoints."""
+
+import base64
+import io
+import wave
+
+import numpy as np
+
+# Mouth-shape envelope resolution: one level per 40 ms is plenty for a
+# two-image avatar and keeps the payload at 25 bytes per second of audio.
+ENVELOPE_FPS = 25
+# Levels map -60..0 dBFS onto 0..255.
+ENVELOPE_FLOOR_DB = -60.0
+
+
+def pcm_rate(mime_type: str | None, default: int = 24000) -> int:
+    """Extracts the sample rate from e.g. ``audio/L16;codec=pcm;rate=24000``."""
+    if mime_type and "rate=" in mime_type:
+        try:
+            return int(mime_type.split("rate=")[1].split(";")[0])
+        except (ValueError, IndexError):
+            pass
+    return default
+
+
+def pcm_to_wav(pcm_data: bytes, sample_rate: int = 24000) -> bytes:
+    """Converts raw PCM data to WAV format."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)  # 16-bit
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm_data)
+    return buffer.getvalue()
+
+
+def compute_envelope(
+    pcm_data: bytes, sample_rate: int = 24000, fps: int = ENVELOPE_FPS
+) -> bytes:
+    """Returns one loudness level (0-255) per ``1/fps`` s of 16-bit mono PCM.
+
+    Levels are the frame RMS on a dB scale, so a fixed threshold works as an
+    open/closed mouth viseme regardless of the overall output gain. The last
+    partial frame is averaged over the samples it has.
+    """
+    samples = np.frombuffer(pcm_data, dtype="<i2", count=len(pcm_data) // 2)
+    hop = max(1, sample_rate // fps)
+    full = len(samples) // hop * hop
+
+    frames = samples[:full].reshape(-1, hop).astype(np.float32)
+    mean_square = np.einsum("ij,ij->i", frames, frames) / hop
+    if full < len(samples):
+        tail = samples[full:].astype(np.float32)
+        mean_square = np.append(mean_square, np.dot(tail, tail) / len(tail))
+
+    db = 10.0 * np.log10(np.maximum(mean_square, 1.0) / 32768.0**2)
+    levels = (db - ENVELOPE_FLOOR_DB) * (255.0 / -ENVELOPE_FLOOR_DB)
+    return np.clip(levels, 0, 255).astype(np.uint8).tobytes()
+
+
+def envelope_payload(pcm_data: bytes, sample_rate: int = 24000) -> dict:
+    """The envelope as shipped to clients next to the audio it describes."""
+    levels = compute_envelope(pcm_data, sample_rate)
+    return {"fps": ENVELOPE_FPS, "levels": base64.b64encode(levels).decode("ascii")}
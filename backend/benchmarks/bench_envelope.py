@@ -0,0 +1,47 @@
+"""Benchmarks the mouth-shape envelope against the audio it describes.
+
+The envelope is computed for every outgoing audio chunk, so it has to stay
+well under 1% of the chunk's playback time. Exits non-zero when it does not.
+
+    uv run python -m benchmarks.bench_envelope
+"""
+
+import sys
+import timeit
+
+import numpy as np
+
+from audio import compute_envelope
+
+SAMPLE_RATE = 24000
+BUDGET = 0.01  # fraction of the audio duration
+
+
+def speech_like_pcm(samples: int) -> bytes:
+    """A 180 Hz tone with syllable-rate amplitude modulation plus noise."""
+    rng = np.random.default_rng(0)
+    t = np.arange(samples) / SAMPLE_RATE
+    wave = np.sin(2 * np.pi * 180 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t))
+    wave += rng.normal(0, 0.02, samples)
+    return (np.clip(wave, -1, 1) * 20000).astype("<i2").tobytes()
+
+
+def main():
+    failed = False
+    # A Live API chunk, a short reply and a long TTS reply.
+    for samples in (4096, SAMPLE_RATE * 3, SAMPLE_RATE * 30):
+        pcm = speech_like_pcm(samples)
+        timer = timeit.Timer(lambda pcm=pcm: compute_envelope(pcm, SAMPLE_RATE))
+        number, _ = timer.autorange()
+        seconds = min(timer.repeat(repeat=5, number=number)) / number
+        ratio = seconds / (samples / SAMPLE_RATE)
+        failed |= ratio >= BUDGET
+        print(
+            f"{samples:>8} samples: {seconds * 1e6:9.1f} us/call, "
+            f"{ratio * 100:.4f}% of audio duration"
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Compares concurrent /ws sessions per instance: uvicorn vs serve.py.
+
+For each runtime the backend is started against ``fake_upstream --echo``,
+which sends every relayed audio chunk straight back as model audio. At each
+concurrency level, that many clients stream 100 ms chunks of 16 kHz audio
+for ``--duration`` seconds and time each round trip (client -> backend ->
+upstream -> backend -> client).
+
+A runtime sustains a level when no session fails and the p95 round trip
+stays within ``--budget-ms``; ``sessions_per_instance`` is the highest such
+level. The load generator and fake upstream share the machine with the
+backend, so compare runtimes on the same host only.
+
+    uv run python -m benchmarks.bench_sessions --levels 25,50,100,200
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import deque
+
+import websockets
+
+from replay import free_port, percentile, start_backend, wait_for_port
+
+FRAME_INTERVAL = 0.1
+# 100 ms of 16 kHz 16-bit audio, as the browser sends it
+FRAME = json.dumps(
+    {"type": "audio", "audio": base64.b64encode(bytes(3200)).decode("ascii")}
+)
+CONFIG = json.dumps({"type": "config", "userName": "bench"})
+
+
+async def run_session(url: str, duration: float) -> list[float]:
+    """Streams audio for ``duration`` seconds; returns round trips in ms."""
+    round_trips: list[float] = []
+    sent: deque[float] = deque()
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(CONFIG)
+
+        async def reader():
+            async for message in ws:
+                data = json.loads(message)
+                events = data["events"] if data["type"] == "batch" else [data]
+                for event in events:
+                    if event["type"] == "audio" and sent:
+                        round_trips.append(
+                            (time.perf_counter() - sent.popleft()) * 1000
+                        )
+
+        reader_task = asyncio.create_task(reader())
+        end = time.perf_counter() + duration
+        next_at = time.perf_counter()
+        while next_at < end:
+            sent.append(time.perf_counter())
+            await ws.send(FRAME)
+            next_at += FRAME_INTERVAL
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        # Let the last echoes arrive
+        await asyncio.sleep(1.0)
+        reader_task.cancel()
+    if sent:
+        raise RuntimeError(f"{len(sent)} frames never came back")
+    return round_trips
+
+
+async def run_level(url: str, sessions: int, duration: float) -> dict:
+    # Spread connects over one frame interval, as real clients would be
+    async def staggered(i):
+        await asyncio.sleep(FRAME_INTERVAL * i / sessions)
+        return await run_session(url, duration)
+
+    results = await asyncio.gather(
+        *(staggered(i) for i in range(sessions)), return_exceptions=True
+    )
+    round_trips = [ms for r in results if isinstance(r, list) for ms in r]
+    return {
+        "sessions": sessions,
+        "failed": sum(1 for r in results if isinstance(r, BaseException)),
+        "frames": len(round_trips),
+        "round_trip_ms_p50": round(percentile(round_trips, 50), 2),
+        "round_trip_ms_p95": round(percentile(round_trips, 95), 2),
+    }
+
+
+def wait_ready(port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz") as r:
+                if r.status == 200:
+                    return
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise TimeoutError("backend never became ready")
+        time.sleep(0.2)
+
+
+async def bench_runtime(serve: bool, levels, duration, budget_ms) -> dict:
+    fake_port, port = free_port(), free_port()
+    fake = subprocess.Popen(
+        [sys.executable, "fake_upstream.py", "--echo", "--port", str(fake_port)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    backend = None
+    try:
+        await wait_for_port(fake_port)
+        backend = start_backend(port, fake_port, serve=serve)
+        await asyncio.to_thread(wait_ready, port)
+        url = f"ws://127.0.0.1:{port}/ws"
+
+        results = []
+        for sessions in levels:
+            result = await run_level(url, sessions, duration)
+            print(json.dumps(result), file=sys.stderr)
+            results.append(result)
+        sustained = [
+            r["sessions"]
+            for r in results
+            if not r["failed"] and r["round_trip_ms_p95"] <= budget_ms
+        ]
+        return {
+            "sessions_per_instance": max(sustained, default=0),
+            "levels": results,
+        }
+    finally:
+        for process in (backend, fake):
+            if process:
+                process.terminate()
+                process.wait()
+
+
+async def bench(args) -> dict:
+    levels = [int(n) for n in args.levels.split(",")]
+    report = {"budget_ms": args.budget_ms, "duration_s": args.duration}
+    print("uvicorn main:app (single worker)", file=sys.stderr)
+    report["uvicorn"] = await bench_runtime(
+        False, levels, args.duration, args.budget_ms
+    )
+    print("serve.py", file=sys.stderr)
+    report["serve"] = await bench_runtime(True, levels, args.duration, args.budget_ms)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", default="25,50,100,200")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    parser.add_argument("--report", help="write the JSON report to this path")
+    args = parser.parse_args()
+
+    report = asyncio.run(bench(args))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps({k: v for k, v in report.items() if not isinstance(v, dict)}))
+    for runtime in ("uvicorn", "serve"):
+        print(f"{runtime}: {report[runtime]['sessions_per_instance']} sessions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Micro-benchmarks for the per-frame and per-response relay code.
+
+Each case is measured for:
+
+- ``ops_per_sec``: calls per second (best of 5 ``timeit`` repeats).
+- ``retained_blocks``: memory blocks still alive per call when results are
+  kept, i.e. the objects a call hands back (tracemalloc). Temporaries a call
+  frees before returning are not counted; ``bytes_copied`` covers those.
+- ``bytes_copied``: peak bytes newly allocated during one call (tracemalloc),
+  which for these copy-bound functions is the data written to fresh buffers.
+
+``retained_blocks`` and ``bytes_copied`` are deterministic and comparable across
+machines; ``ops_per_sec`` is only comparable on the machine that recorded the
+baseline, so its tolerance is looser.
+
+    uv run python -m benchmarks.run                # print results
+    uv run python -m benchmarks.run --check        # compare to baseline.json
+    uv run python -m benchmarks.run --save         # rewrite baseline.json
+
+``--check`` is not part of CI: shared runners are too noisy for the
+``ops_per_sec`` figures, so run it locally before merging changes to the
+relay or audio code.
+"""
+
+import argparse
+import base64
+import binascii
+import gc
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+from collections.abc import Callable
+
+from audio import compute_envelope, pcm_to_wav
+from benchmarks.bench_envelope import speech_like_pcm
+from relay import realtime_input, server_events
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Relative slack before a change counts as a regression. Timings on shared
+# machines swing by a third between runs; the memory figures do not.
+OPS_TOLERANCE = 0.4
+MEMORY_TOLERANCE = 0.10
+
+# A 4096-sample frame from audio-processor.js (16 kHz mic input) and from
+# the Live API (24 kHz output), and a 5 s reply from the TTS model.
+FRAME_SAMPLES = 4096
+TTS_SAMPLES = 24000 * 5
+
+FRAME_PCM = speech_like_pcm(FRAME_SAMPLES)
+FRAME_B64 = base64.b64encode(FRAME_PCM).decode("ascii")
+TTS_PCM = speech_like_pcm(TTS_SAMPLES)
+TTS_B64 = base64.b64encode(TTS_PCM).decode("ascii")
+
+CLIENT_FRAME = json.dumps({"type": "audio", "audio": FRAME_B64})
+LIVE_MESSAGE = json.dumps(
+    {
+        "serverContent": {
+            "modelTurn": {
+                "parts": [
+                    {
+                        "inlineData": {
+                            "mimeType": "audio/pcm;rate=24000",
+                            "data": FRAME_B64,
+                        }
+                    }
+                ]
+            },
+            "outputTranscription": {"text": "こんにちは"},
+        }
+    }
+)
+LIVE_EVENTS = server_events(json.loads(LIVE_MESSAGE))
+
+
+def send_json(data) -> str:
+    """What Starlette's ``WebSocket.send_json`` does before writing."""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+CASES: dict[str, Callable[[], object]] = {
+    "pcm_to_wav/frame": lambda: pcm_to_wav(FRAME_PCM),
+    "pcm_to_wav/tts": lambda: pcm_to_wav(TTS_PCM),
+    "b64encode/frame": lambda: base64.b64encode(FRAME_PCM).decode("ascii"),
+    "b64encode/tts": lambda: base64.b64encode(TTS_PCM).decode("ascii"),
+    "b64decode/frame": lambda: base64.b64decode(FRAME_B64),
+    "b64decode/tts": lambda: base64.b64decode(TTS_B64),
+    # Replacement codecs: binascii skips base64's argument normalisation.
+    "b2a_base64/frame": lambda: binascii.b2a_base64(FRAME_PCM, newline=False),
+    "a2b_base64/frame": lambda: binascii.a2b_base64(FRAME_B64),
+    "envelope/frame": lambda: compute_envelope(FRAME_PCM),
+    "envelope/tts": lambda: compute_envelope(TTS_PCM),
+    # client_to_gemini: parse the browser frame, wrap it for Gemini.
+    "client_to_gemini/frame": lambda: realtime_input(json.loads(CLIENT_FRAME)["audio"]),
+    # gemini_to_client: parse, walk the parts, serialise every event.
+    "gemini_to_client/frame": lambda: [
+        send_json(event) for event in server_events(json.loads(LIVE_MESSAGE))
+    ],
+    "server_events/frame": lambda: server_events(json.loads(LIVE_MESSAGE)),
+    "send_json/frame": lambda: [send_json(event) for event in LIVE_EVENTS],
+}
+
+
+KEEP_CALLS = 20
+
+
+def retained_blocks(fn: Callable[[], object]) -> int:
+    """Blocks alive after ``KEEP_CALLS`` calls whose results are kept."""
+    gc.collect()
+    fn()
+    before = tracemalloc.take_snapshot()
+    kept = [fn() for _ in range(KEEP_CALLS)]
+    after = tracemalloc.take_snapshot()
+    del kept
+    return sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+
+
+def measure(fn: Callable[[], object]) -> dict:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=5, number=number)) / number
+
+    tracemalloc.start()
+    # Subtract what the list holding the results costs by itself.
+    blocks = retained_blocks(fn) - retained_blocks(lambda: None)
+
+    tracemalloc.reset_peak()
+    current, _ = tracemalloc.get_traced_memory()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "ops_per_sec": round(1 / best, 1),
+        "retained_blocks": round(blocks / KEEP_CALLS, 1),
+        "bytes_copied": peak - current,
+    }
+
+
+def run(selected: list[str] | None = None) -> dict:
+    return {
+        name: measure(fn)
+        for name, fn in CASES.items()
+        if not selected or any(name.startswith(s) for s in selected)
+    }
+
+
+def check(results: dict, baseline: dict) -> list[str]:
+    """Returns a description of every regression against the baseline."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        if current["ops_per_sec"] < previous["ops_per_sec"] * (1 - OPS_TOLERANCE):
+            regressions.append(
+                f"{name}: ops_per_sec {previous['ops_per_sec']} -> "
+                f"{current['ops_per_sec']}"
+            )
+        for key in ("retained_blocks", "bytes_copied"):
+            limit = previous[key] * (1 + MEMORY_TOLERANCE) + 1
+            if current[key] > limit:
+                regressions.append(f"{name}: {key} {previous[key]} -> {current[key]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("cases", nargs="*", help="case name prefixes to run")
+    parser.add_argument("--save", action="store_true", help="rewrite baseline")
+    parser.add_argument("--check", action="store_true", help="fail on regression")
+    parser.add_argument("--json", action="store_true", help="print raw JSON")
+    args = parser.parse_args()
+
+    results = run(args.cases)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'case':28} {'ops/sec':>12} {'retained':>8} {'bytes copied':>13}")
+        for name, r in results.items():
+            print(
+                f"{name:28} {r['ops_per_sec']:>12,.0f} {r['retained_blocks']:>8} "
+                f"{r['bytes_copied']:>13,}"
+            )
+
+    if args.save:
+        baseline = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results,
+        }
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+
+    if args.check:
+        with open(BASELINE_PATH) as f:
+            regressions = check(results, json.load(f))
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
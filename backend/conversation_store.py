@@ -0,0 +1,245 @@
+"""Write-behind persistence of Live conversation transcripts.
+
+Transcript fragments of a session are assembled into turns in memory by a
+``ConversationWriter`` and committed in batches: when ``FLUSH_TURNS`` turns
+are buffered, ``FLUSH_INTERVAL`` seconds after the first unflushed turn, and
+when the session ends. At most one commit per session is in flight; while
+the database is slow, turns keep buffering up to ``MAX_BUFFERED_TURNS`` and
+the oldest are dropped (and counted) beyond that. The final flush on session
+end is given ``CLOSE_TIMEOUT`` seconds; whatever is left after that, or
+after a failed final commit, is counted as dropped.
+
+Commits may be retried after a partial failure, so every write is
+idempotent: turns are keyed by their sequence number and the session's
+``turn_count`` is set to the last sequence number plus one, not incremented.
+
+``CONVERSATION_STORE`` selects the backend: ``firestore`` writes to
+``users/{uid}/sessions/{session_id}/turns/{seq}`` (set
+``FIRESTORE_EMULATOR_HOST`` to use the local emulator), ``memory`` keeps
+everything in process, and ``none`` (the default) disables persistence.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "none")
+FLUSH_TURNS = int(os.getenv("CONVERSATION_FLUSH_TURNS", "10"))
+FLUSH_INTERVAL = float(os.getenv("CONVERSATION_FLUSH_INTERVAL", "5.0"))
+MAX_BUFFERED_TURNS = int(os.getenv("CONVERSATION_MAX_BUFFERED_TURNS", "200"))
+CLOSE_TIMEOUT = float(os.getenv("CONVERSATION_CLOSE_TIMEOUT", "10.0"))
+# Upper bound for a single turn's text; fragments beyond it are discarded.
+MAX_TURN_CHARS = 10_000
+
+# Firestore rejects batches with more than 500 writes.
+FIRESTORE_BATCH_LIMIT = 500
+
+
+class InMemoryStore:
+    """Store that keeps committed turns in a dict, for tests and local runs.
+
+    ``delay`` makes every commit block for that many seconds, to exercise
+    the buffering behaviour of a slow database.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.turns: dict[tuple[str, str], list[dict]] = {}
+        self.commits = 0
+
+    def commit(self, uid: str, session_id: str, turns: list[dict]) -> None:
+        if self.delay:
+            time.sleep(self.delay)
+        self.turns.setdefault((uid, session_id), []).extend(turns)
+        self.commits += 1
+
+
+class FirestoreStore:
+    """Commits turns with Firestore batched writes."""
+
+    def __init__(self):
+        from firebase_admin import firestore
+
+        self._firestore = firestore
+        self._db = None
+
+    @property
+    def db(self):
+        # Created on first use, so a pre-forking server never shares the
+        # gRPC channel between workers.
+        if self._db is None:
+            self._db = self._firestore.client()
+        return self._db
+
+    def commit(self, uid: str, session_id: str, turns: list[dict]) -> None:
+        session_ref = (
+            self.db.collection("users")
+            .document(uid)
+            .collection("sessions")
+            .document(session_id)
+        )
+        # One write per turn plus the session summary, in chunks Firestore
+        # accepts. A writer commits turns in sequence order, so the last
+        # chunk leaves the highest count even when earlier ones are retried.
+        step = FIRESTORE_BATCH_LIMIT - 1
+        for start in range(0, len(turns), step):
+            chunk = turns[start : start + step]
+            batch = self.db.batch()
+            for turn in chunk:
+                turn_ref = session_ref.collection("turns").document(
+                    f"{turn['seq']:06d}"
+                )
+                batch.set(turn_ref, turn)
+            batch.set(
+                session_ref,
+                {
+                    "updated_at": chunk[-1]["ended_at"],
+                    "turn_count": chunk[-1]["seq"] + 1,
+                },
+                merge=True,
+            )
+            batch.commit()
+
+
+def create_store(kind: str = CONVERSATION_STORE):
+    """Returns the configured store, or None when persistence is off."""
+    if kind == "firestore":
+        return FirestoreStore()
+    if kind == "memory":
+        return InMemoryStore()
+    return None
+
+
+class ConversationWriter:
+    """Buffers the turns of one session and flushes them in batches."""
+
+    def __init__(self, store, uid: str, session_id: str):
+        self.store = store
+        self.uid = uid
+        self.session_id = session_id
+        self._current: dict | None = None
+        self._buffer: list[dict] = []
+        self._seq = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._flush_task: asyncio.Task | None = None
+        self.flushed = 0
+        self.dropped = 0
+
+    @property
+    def buffered(self) -> int:
+        return len(self._buffer)
+
+    def observe(self, events: list[dict]) -> None:
+        """Feeds the client events of one upstream message."""
+        for event in events:
+            kind = event["type"]
+            if kind == "user_transcript":
+                self._add("user", event["text"])
+            elif kind == "transcript":
+                self._add("model", event["text"])
+            elif kind in ("turn_complete", "interrupted"):
+                self._end_turn()
+
+    def _add(self, role: str, text: str) -> None:
+        if self._current is not None and self._current["role"] != role:
+            self._end_turn()
+        if self._current is None:
+            now = time.time()
+            self._current = {"role": role, "text": "", "started_at": now}
+        if len(self._current["text"]) < MAX_TURN_CHARS:
+            self._current["text"] += text
+
+    def _end_turn(self) -> None:
+        turn, self._current = self._current, None
+        if turn is None or not turn["text"].strip():
+            return
+        turn["text"] = turn["text"].strip()
+        turn["ended_at"] = time.time()
+        turn["seq"] = self._seq
+        self._seq += 1
+
+        self._buffer.append(turn)
+        if len(self._buffer) > MAX_BUFFERED_TURNS:
+            overflow = len(self._buffer) - MAX_BUFFERED_TURNS
+            del self._buffer[:overflow]
+            self.dropped += overflow
+            logger.warning(
+                "Conversation buffer full, dropped oldest turns",
+                extra={"sample": "conversation_drop", "dropped": self.dropped},
+            )
+
+        if len(self._buffer) >= FLUSH_TURNS:
+            self._start_flush()
+        elif self._timer is None:
+            self._schedule()
+
+    def _schedule(self) -> None:
+        self._timer = asyncio.get_running_loop().call_later(
+            FLUSH_INTERVAL, self._start_flush
+        )
+
+    def _start_flush(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            # A commit is in flight; it picks up the new turns when it ends.
+            return
+        self._flush_task = asyncio.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._buffer:
+            turns, self._buffer = self._buffer, []
+            try:
+                await asyncio.to_thread(
+                    self.store.commit, self.uid, self.session_id, turns
+                )
+            except Exception as e:
+                logger.error("Failed to persist conversation turns: %s", e)
+                # Put them back ahead of anything buffered meanwhile and retry
+                # on the next interval; the cap keeps this bounded.
+                self._buffer[:0] = turns
+                overflow = len(self._buffer) - MAX_BUFFERED_TURNS
+                if overflow > 0:
+                    del self._buffer[:overflow]
+                    self.dropped += overflow
+                break
+            self.flushed += len(turns)
+            if len(self._buffer) < FLUSH_TURNS:
+                break
+        if self._buffer and self._timer is None:
+            self._schedule()
+
+    async def close(self, timeout: float = CLOSE_TIMEOUT) -> None:
+        """Ends the open turn and flushes what is buffered within ``timeout``."""
+        self._end_turn()
+        reason = "failed"
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except TimeoutError:
+            # A commit cut short here may still land from its worker thread
+            reason = "timed_out"
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._buffer:
+            # No retry comes after close(); what is left is lost
+            logger.warning(
+                "Conversation flush incomplete, dropping buffered turns",
+                extra={
+                    "reason": reason,
+                    "buffered": len(self._buffer),
+                    "timeout": timeout,
+                },
+            )
+            self.dropped += len(self._buffer)
+            self._buffer = []
+
+    async def _drain(self) -> None:
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        if self._buffer:
+            await self._flush()
@@ -0,0 +1,240 @@
+"""Local stand-in for the Gemini Live websocket API.
+
+Serves the BidiGenerateContent protocol at ``/ws``: it accepts the ``setup``
+message, then plays back the upstream side of a recorded session at its
+original timing (scaled by ``speed``) while draining whatever the backend
+relays from the client. Point the backend at it with
+``GEMINI_WS_URL=ws://127.0.0.1:<port>/ws``.
+
+The recording a connection plays is picked from the user name embedded in
+the system instruction (``replay.py`` sends ``replay-<n>`` as ``userName``);
+connections without a known name only get a ``setupComplete``. With ``echo``
+set, every ``realtimeInput`` chunk is sent straight back as model audio, so a
+load generator can time round trips (``benchmarks/bench_sessions.py``);
+other client messages such as ``clientContent`` are not answered.
+
+It also answers ``POST /v1beta/models/{model}:generateContent`` with a canned
+text or, when audio is requested, PCM reply after a per-model delay and with
+a per-model failure rate, so model routing can be exercised with
+``GEMINI_API_BASE_URL=http://127.0.0.1:<port>``.
+
+Run standalone with ``python fake_upstream.py --port 9000 recordings/*.rec``,
+adding e.g. ``--latency gemini-2.5-flash-preview-tts=6000 --error-rate
+gemini-2.5-flash=0.3`` to degrade a model.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import re
+import time
+from collections import Counter
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+from session_recorder import KIND_UPSTREAM, Recording
+
+SETUP_COMPLETE = json.dumps({"setupComplete": {}}).encode()
+_REPLAY_NAME = re.compile(r"「(replay-\d+)」")
+
+# Half a second of a quiet 220 Hz tone, as 24 kHz 16-bit PCM
+_TONE = (
+    (np.sin(2 * np.pi * 220 * np.arange(12_000) / 24_000) * 3000)
+    .astype("<i2")
+    .tobytes()
+)
+FAKE_AUDIO = base64.b64encode(_TONE).decode("ascii")
+
+
+def load_upstream_timeline(path: str) -> list[tuple[float, bytes]]:
+    """Returns ``(offset seconds, payload)`` for each upstream message."""
+    recording = Recording(path)
+    try:
+        return [
+            (record.offset_us / 1_000_000, bytes(record.payload))
+            for record in recording
+            if record.kind == KIND_UPSTREAM
+        ]
+    finally:
+        recording.close()
+
+
+class FakeUpstream:
+    """Timelines to play plus per-connection send/receive bookkeeping."""
+
+    def __init__(
+        self,
+        timelines: dict[str, list[tuple[float, bytes]]],
+        speed=1.0,
+        latency: dict[str, float] | None = None,
+        error_rate: dict[str, float] | None = None,
+        echo: bool = False,
+    ):
+        self.timelines = timelines
+        self.speed = speed
+        self.echo = echo
+        # model (or "*") -> seconds / failure probability for generateContent
+        self.latency = latency or {}
+        self.error_rate = error_rate or {}
+        self.calls: Counter[str] = Counter()
+        # name -> perf_counter() of every message sent, read by replay.py
+        self.sent_at: dict[str, list[float]] = {}
+        self.frames_received: dict[str, int] = {}
+
+    def _setting(self, table: dict[str, float], model: str) -> float:
+        return table.get(model, table.get("*", 0.0))
+
+    def create_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/v1beta/models/{model}:generateContent")
+        async def generate_content(model: str, request: Request):
+            body = await request.json()
+            self.calls[model] += 1
+            await asyncio.sleep(self._setting(self.latency, model))
+            if random.random() < self._setting(self.error_rate, model):
+                return JSONResponse(
+                    {
+                        "error": {
+                            "code": 503,
+                            "message": f"{model} is overloaded",
+                            "status": "UNAVAILABLE",
+                        }
+                    },
+                    status_code=503,
+                )
+
+            modalities = body.get("generationConfig", {}).get("responseModalities", [])
+            if "AUDIO" in modalities:
+                part = {
+                    "inlineData": {
+                        "mimeType": "audio/L16;codec=pcm;rate=24000",
+                        "data": FAKE_AUDIO,
+                    }
+                }
+            else:
+                part = {"text": f"({model}) はい、聞こえていますよ。"}
+            return {
+                "candidates": [
+                    {
+                        "content": {"role": "model", "parts": [part]},
+                        "finishReason": "STOP",
+                    }
+                ],
+                "usageMetadata": {
+                    "promptTokenCount": 10,
+                    "candidatesTokenCount": 12,
+                    "totalTokenCount": 22,
+                },
+                "modelVersion": model,
+            }
+
+        @app.websocket("/ws")
+        async def live(websocket: WebSocket):
+            await websocket.accept()
+            setup = json.loads(await websocket.receive_text())
+            instruction = (
+                setup.get("setup", {})
+                .get("systemInstruction", {})
+                .get("parts", [{}])[0]
+                .get("text", "")
+            )
+            match = _REPLAY_NAME.search(instruction)
+            name = match.group(1) if match else None
+            timeline = self.timelines.get(name)
+            if not timeline:
+                await websocket.send_bytes(SETUP_COMPLETE)
+                timeline = []
+            sent = self.sent_at.setdefault(name, [])
+
+            async def drain():
+                try:
+                    while True:
+                        frame = await websocket.receive_text()
+                        self.frames_received[name] = (
+                            self.frames_received.get(name, 0) + 1
+                        )
+                        reply = _echo(frame) if self.echo else None
+                        if reply:
+                            await websocket.send_bytes(reply)
+                except WebSocketDisconnect:
+                    pass
+
+            drain_task = asyncio.create_task(drain())
+            start = time.perf_counter()
+            try:
+                for offset, payload in timeline:
+                    delay = start + offset / self.speed - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    await websocket.send_bytes(payload)
+                    sent.append(time.perf_counter())
+                await drain_task
+            except (WebSocketDisconnect, RuntimeError):
+                pass
+            finally:
+                drain_task.cancel()
+
+        return app
+
+
+def _echo(frame: str) -> bytes | None:
+    """Model audio echoing a ``realtimeInput`` frame; None for anything else."""
+    try:
+        chunks = json.loads(frame)["realtimeInput"]["mediaChunks"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    parts = [
+        {"inlineData": {"mimeType": "audio/pcm;rate=24000", "data": chunk["data"]}}
+        for chunk in chunks
+    ]
+    return json.dumps({"serverContent": {"modelTurn": {"parts": parts}}}).encode()
+
+
+def _pairs(values: list[str]) -> list[tuple[str, str]]:
+    return [tuple(value.rsplit("=", 1)) for value in values]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recordings", nargs="*")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument(
+        "--latency",
+        action="append",
+        default=[],
+        metavar="MODEL=MS",
+        help="generateContent delay per model ('*' for all)",
+    )
+    parser.add_argument(
+        "--error-rate",
+        action="append",
+        default=[],
+        metavar="MODEL=RATE",
+        help="generateContent failure probability per model ('*' for all)",
+    )
+    parser.add_argument(
+        "--echo", action="store_true", help="send client audio back as model audio"
+    )
+    args = parser.parse_args()
+
+    timelines = {
+        f"replay-{i}": load_upstream_timeline(path)
+        for i, path in enumerate(args.recordings)
+    }
+    latency = {k: float(v) / 1000 for k, v in _pairs(args.latency)}
+    error_rate = {k: float(v) for k, v in _pairs(args.error_rate)}
+    app = FakeUpstream(
+        timelines, args.speed, latency, error_rate, args.echo
+    ).create_app()
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
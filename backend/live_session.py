@@ -0,0 +1,330 @@
+"""Lifecycle of one ``/ws`` session and the registry of live sessions.
+
+A ``LiveSession`` owns the browser socket, the upstream Gemini Live socket
+and both relay directions. The two directions and a watchdog run as tasks;
+the first one to finish ends the session, the others are cancelled, and
+leaving ``websockets.connect`` closes the upstream socket. A session also
+ends after ``SESSION_IDLE_TIMEOUT`` seconds without a frame in either
+direction or ``SESSION_MAX_DURATION`` seconds in total.
+
+Every session is listed in ``session_registry`` while it runs, with its
+frame/byte counts, queue depths and token usage. The registry is a
+Prometheus collector. It also keeps weak references to every upstream
+socket it has seen; ``upstream_connections_leaked`` counts those that are
+still open while no running session holds them, and should stay at zero.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import weakref
+from collections import Counter
+
+import websockets
+from fastapi import WebSocket, WebSocketDisconnect
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from websockets.protocol import State
+
+from conversation_store import ConversationWriter
+from log_config import sampling_filter, truncate
+from model_router import model_router
+from outbound import OutboundBatcher
+from pacer import AUDIO_PACING_LEAD_MS, AudioPacer
+from relay import realtime_input, server_events
+from session_recorder import open_recorder
+from usage import live_usage, usage_meter
+
+logger = logging.getLogger(__name__)
+
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "120"))
+SESSION_MAX_DURATION = float(os.getenv("SESSION_MAX_DURATION", "1800"))
+
+
+class SessionRegistry:
+    """Live sessions by id, plus lifetime counters for ``/metrics``."""
+
+    def __init__(self):
+        self._sessions: dict[str, "LiveSession"] = {}
+        self.upstream_opened = 0
+        self.upstream_closed = 0
+        self.ended: Counter[str] = Counter()
+        # Every upstream socket still referenced anywhere, held or not
+        self._upstreams: weakref.WeakSet = weakref.WeakSet()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __iter__(self):
+        return iter(list(self._sessions.values()))
+
+    def get(self, session_id: str) -> "LiveSession | None":
+        return self._sessions.get(session_id)
+
+    def add(self, session: "LiveSession") -> None:
+        self._sessions[session.session_id] = session
+
+    def remove(self, session: "LiveSession") -> None:
+        if self._sessions.pop(session.session_id, None) is not None:
+            self.ended[session.end_reason or "unknown"] += 1
+
+    def track_upstream(self, ws) -> None:
+        self.upstream_opened += 1
+        self._upstreams.add(ws)
+
+    def leaked_upstreams(self) -> int:
+        """Upstream sockets not closed and not held by a registered session."""
+        held = {id(s.upstream) for s in self._sessions.values() if s.upstream}
+        return sum(
+            1
+            for ws in list(self._upstreams)
+            if ws.state is not State.CLOSED and id(ws) not in held
+        )
+
+    def snapshot(self) -> list[dict]:
+        return [session.stats() for session in self]
+
+    def collect(self):
+        """Prometheus collector hook."""
+        live = GaugeMetricFamily("live_sessions", "Running /ws sessions")
+        live.add_metric([], len(self._sessions))
+        yield live
+
+        upstream = GaugeMetricFamily(
+            "upstream_connections_open", "Open Gemini Live sockets"
+        )
+        upstream.add_metric([], self.upstream_opened - self.upstream_closed)
+        yield upstream
+        leaked = GaugeMetricFamily(
+            "upstream_connections_leaked",
+            "Open Gemini Live sockets not held by a running session",
+        )
+        leaked.add_metric([], self.leaked_upstreams())
+        yield leaked
+
+        opened = CounterMetricFamily(
+            "upstream_connections_opened", "Gemini Live sockets opened"
+        )
+        opened.add_metric([], self.upstream_opened)
+        yield opened
+        closed = CounterMetricFamily(
+            "upstream_connections_closed", "Gemini Live sockets closed"
+        )
+        closed.add_metric([], self.upstream_closed)
+        yield closed
+
+        ended = CounterMetricFamily(
+            "sessions_ended", "Ended /ws sessions by reason", labels=["reason"]
+        )
+        for reason, count in list(self.ended.items()):
+            ended.add_metric([reason], count)
+        yield ended
+
+
+session_registry = SessionRegistry()
+
+
+class LiveSession:
+    """Relays one browser session to Gemini Live until either side ends it."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        session_id: str,
+        registry: SessionRegistry = session_registry,
+    ):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.registry = registry
+        self.user_id: str | None = None
+        self.recorder = open_recorder(session_id)
+        self.batcher = OutboundBatcher(websocket.send_json)
+        self.pacer = AudioPacer(self.batcher.push) if AUDIO_PACING_LEAD_MS > 0 else None
+        self.writer: ConversationWriter | None = None
+
+        self.started_at = time.monotonic()
+        self.last_activity = self.started_at
+        self.upstream = None
+        self.end_reason: str | None = None
+        self.client_frames = 0
+        self.client_bytes = 0
+        self.upstream_frames = 0
+        self.upstream_bytes = 0
+
+        registry.add(self)
+
+    def set_user(self, user_id: str, store) -> None:
+        """Attributes the session to an authenticated user."""
+        self.user_id = user_id
+        if store:
+            self.writer = ConversationWriter(store, user_id, self.session_id)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "session_id": self.session_id,
+            "uid": self.user_id,
+            "age": round(now - self.started_at, 3),
+            "idle": round(now - self.last_activity, 3),
+            "upstream_open": self.upstream is not None,
+            "client_frames": self.client_frames,
+            "client_bytes": self.client_bytes,
+            "upstream_frames": self.upstream_frames,
+            "upstream_bytes": self.upstream_bytes,
+            "outbound_pending": self.batcher.pending,
+            "paced_pending": self.pacer.pending if self.pacer else 0,
+            "paced_buffered_s": round(self.pacer.buffered_seconds, 3)
+            if self.pacer
+            else 0.0,
+            "conversation_buffered": self.writer.buffered if self.writer else 0,
+            "usage": usage_meter.for_session(self.session_id),
+        }
+
+    async def run(self, url: str, setup_msg: dict) -> None:
+        """Connects upstream and relays until the session ends."""
+        # Live routing is judged on connect + setup time
+        model = setup_msg["setup"]["model"].removeprefix("models/")
+        start = time.perf_counter()
+        set_up = False
+        try:
+            async with websockets.connect(url) as gemini_ws:
+                self.upstream = gemini_ws
+                self.registry.track_upstream(gemini_ws)
+                await gemini_ws.send(json.dumps(setup_msg))
+                setup_response = await gemini_ws.recv()
+                model_router.observe(
+                    "live", model, time.perf_counter() - start, ok=True
+                )
+                set_up = True
+                if self.recorder:
+                    self.recorder.upstream(setup_response)
+                logger.info(
+                    "Setup response received",
+                    extra={"response": truncate(setup_response)},
+                )
+                await self._relay(gemini_ws)
+        except Exception as e:
+            if not set_up:
+                model_router.observe(
+                    "live", model, time.perf_counter() - start, ok=False
+                )
+            self.end_reason = self.end_reason or "error"
+            logger.error("Connection error: %s", e)
+        finally:
+            # Counted once the upstream socket is actually closed
+            if self.upstream is not None:
+                self.upstream = None
+                self.registry.upstream_closed += 1
+            if self.end_reason != "client_closed":
+                try:
+                    await self.websocket.close()
+                except Exception:
+                    # The client may already be gone
+                    pass
+
+    async def _relay(self, gemini_ws) -> None:
+        tasks = {
+            asyncio.create_task(self._client_to_gemini(gemini_ws)),
+            asyncio.create_task(self._gemini_to_client(gemini_ws)),
+            asyncio.create_task(self._watchdog()),
+        }
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Release held output even when a relay task failed
+            if self.pacer:
+                await self.pacer.close()
+            await self.batcher.close()
+        # Several tasks can finish in the same loop iteration; any of them
+        # names the reason, an error wins.
+        for task in done:
+            task.result()
+        self.end_reason = next(iter(done)).result()
+
+    async def _client_to_gemini(self, gemini_ws) -> str:
+        try:
+            while True:
+                data = await self.websocket.receive_text()
+                self.client_frames += 1
+                self.client_bytes += len(data)
+                self.last_activity = time.monotonic()
+                if self.recorder:
+                    self.recorder.client(data)
+                client_msg = json.loads(data)
+
+                if client_msg.get("type") == "audio":
+                    logger.debug(
+                        "Client audio frame",
+                        extra={
+                            "sample": "client_frame",
+                            "chars": len(client_msg["audio"]),
+                        },
+                    )
+                    await gemini_ws.send(realtime_input(client_msg["audio"]))
+        except WebSocketDisconnect:
+            logger.info("Client disconnected")
+            return "client_closed"
+        except websockets.ConnectionClosed:
+            return "upstream_closed"
+
+    async def _gemini_to_client(self, gemini_ws) -> str:
+        try:
+            while True:
+                message = await gemini_ws.recv()
+                self.upstream_frames += 1
+                self.upstream_bytes += len(message)
+                self.last_activity = time.monotonic()
+                if self.recorder:
+                    self.recorder.upstream(message)
+                response = json.loads(message)
+                events = server_events(response)
+                if events and events[-1]["type"] == "turn_complete":
+                    logger.info("Turn complete", extra={"sample": "turn"})
+                usage = live_usage(response)
+                if usage:
+                    usage_meter.record("live", usage, self.user_id, self.session_id)
+                    events.append(
+                        {
+                            "type": "usage",
+                            "prompt_tokens": usage[("prompt", "all")],
+                            "response_tokens": usage[("response", "all")],
+                        }
+                    )
+                await (self.pacer or self.batcher).push(events)
+                if self.writer:
+                    self.writer.observe(events)
+        except websockets.ConnectionClosed as e:
+            logger.info("Upstream closed: %s", e)
+            return "upstream_closed"
+        except WebSocketDisconnect:
+            return "client_closed"
+
+    async def _watchdog(self) -> str:
+        deadline = self.started_at + SESSION_MAX_DURATION
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                logger.info("Session reached max duration")
+                return "max_duration"
+            idle_at = self.last_activity + SESSION_IDLE_TIMEOUT
+            if now >= idle_at:
+                logger.info("Session idle, closing")
+                return "idle"
+            await asyncio.sleep(min(deadline, idle_at) - now)
+
+    async def close(self) -> None:
+        """Releases everything the session holds; call exactly once."""
+        self.end_reason = self.end_reason or "client_closed"
+        self.registry.remove(self)
+        sampling_filter.forget(self.session_id)
+        if self.writer:
+            await self.writer.close()
+        if self.recorder:
+            self.recorder.close()
+        logger.info("Session ended", extra={"reason": self.end_reason, **self.stats()})
+        # Dropped only after the final stats carried the session's totals
+        usage_meter.end_session(self.session_id)
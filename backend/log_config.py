@@ -0,0 +1,171 @@
+"""Structured, non-blocking logging for the backend.
+
+Records are handed to a ``QueueHandler`` on the calling thread and formatted
+as JSON lines by a ``QueueListener`` thread, so string formatting and stream
+I/O never run on the event loop.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+# Session id of the websocket currently being served. Set once per session in
+# the endpoint; asyncio tasks copy it, so every record from that session
+# carries it automatically.
+SESSION_ID: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "session_id", default=None
+)
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "200"))
+LOG_SAMPLE_INTERVAL = float(os.getenv("LOG_SAMPLE_INTERVAL", "1.0"))
+
+# Attributes every LogRecord has; anything else was passed through ``extra``.
+_RESERVED_ATTRS = frozenset(
+    logging.LogRecord("", 0, "", 0, "", None, None).__dict__
+) | {"message", "asctime", "session_id", "sample"}
+
+
+def truncate(value, limit: int = LOG_MAX_FIELD_CHARS) -> str:
+    """Returns ``str(value)`` cut down to ``limit`` characters.
+
+    Bytes (websocket frames) are decoded as UTF-8 rather than shown as their
+    repr, and only the first ``limit`` of them are decoded.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        text = value[:limit].decode("utf-8", "replace")
+        if len(value) <= limit:
+            return text
+        return f"{text}...(+{len(value) - limit} bytes)"
+    text = value if isinstance(value, str) else str(value)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}...(+{len(text) - limit} chars)"
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line.
+
+    Call sites are expected to ``truncate`` large payloads themselves; the
+    formatter applies a looser cap as a safety net.
+    """
+
+    max_chars = LOG_MAX_FIELD_CHARS * 4
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": truncate(record.getMessage(), self.max_chars),
+        }
+        session_id = getattr(record, "session_id", None)
+        if session_id:
+            entry["session_id"] = session_id
+        for key, value in record.__dict__.items():
+            if key in _RESERVED_ATTRS:
+                continue
+            if not isinstance(value, (int, float, bool)) and value is not None:
+                value = truncate(value, self.max_chars)
+            entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+# Log arguments safe to format later on the listener thread
+_IMMUTABLE_ARGS = (str, bytes, int, float, complex, bool, type(None))
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock ``prepare`` renders the message on the caller's thread; we only
+    stamp the session id (a context variable, so it must be read here) and
+    pass the record through. Arguments that the caller could still mutate
+    are the exception: the message is rendered here so the listener never
+    formats an object that has changed since the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.session_id = SESSION_ID.get()
+        args = record.args
+        if args:
+            values = args.values() if isinstance(args, dict) else args
+            if not all(isinstance(v, _IMMUTABLE_ARGS) for v in values):
+                record.msg = record.getMessage()
+                record.args = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Rate-limits records logged with ``extra={"sample": key}``.
+
+    At most one record per key is let through every ``interval`` seconds; the
+    number of records dropped in between is attached as ``suppressed`` to the
+    next one that passes. Records without a ``sample`` key are untouched.
+    Keys are scoped per session so one busy session cannot hide another.
+    """
+
+    def __init__(self, interval: float = LOG_SAMPLE_INTERVAL):
+        super().__init__()
+        self.interval = interval
+        self._last: dict[tuple, float] = {}
+        self._suppressed: dict[tuple, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        sample = getattr(record, "sample", None)
+        if sample is None:
+            return True
+        key = (SESSION_ID.get(), sample)
+        now = time.monotonic()
+        if now - self._last.get(key, float("-inf")) < self.interval:
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            return False
+        self._last[key] = now
+        suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+    def forget(self, session_id: str) -> None:
+        """Drops the sampling state of a finished session."""
+        for key in [k for k in self._last if k[0] == session_id]:
+            self._last.pop(key, None)
+            self._suppressed.pop(key, None)
+
+
+sampling_filter = SamplingFilter()
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """Routes the root logger through a queue to a background listener."""
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(
+            logging.Formatter("%(levelname)s:%(name)s:%(session_id)s: %(message)s")
+        )
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(sampling_filter)
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+
+    listener = logging.handlers.QueueListener(
+        log_queue, stream_handler, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -1,25 +1,25 @@
 import os
 import json
 import tomllib
-import io
-import wave
 import asyncio
 import logging
+import uuid
+from contextlib import asynccontextmanager
 
 
-import websockets
 import firebase_admin
 from firebase_admin import auth, credentials
 from fastapi import (
     FastAPI,
     WebSocket,
-    WebSocketDisconnect,
     HTTPException,
     File,
+    Header,
     UploadFile,
 )
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from prometheus_client import REGISTRY
 from pydantic import BaseModel
 from typing import List, Optional
 from google import genai
@@ -29,9 +29,23 @@ from google.genai import types
 import base64
 from dotenv import load_dotenv
 
+from admin import router as admin_router
+from audio import envelope_payload, pcm_rate, pcm_to_wav
+from conversation_store import create_store
+from live_session import LiveSession, session_registry
+from log_config import SESSION_ID, setup_logging, truncate
+from metrics import metrics_response
+from model_router import model_router
+from usage import genai_usage, usage_meter
+from warmup import warm_state, warm_up
+
 # Load environment variables
 load_dotenv()
 
+# Logger setup
+setup_logging()
+logger = logging.getLogger(__name__)
+
 # Initialize firebase app
 try:
     firebase_admin.get_app()
@@ -50,17 +64,13 @@ except ValueError:
                 cred = credentials.Certificate(json.loads(decoded_json))
 
             firebase_admin.initialize_app(cred)
-            logging.info("Initialized Firebase with service account from env")
+            logger.info("Initialized Firebase with service account from env")
         except Exception as e:
-            logging.error(f"Failed to load FIREBASE_SERVICE_ACCOUNT: {e}")
+            logger.error("Failed to load FIREBASE_SERVICE_ACCOUNT: %s", e)
             firebase_admin.initialize_app()
     else:
         firebase_admin.initialize_app()
 
-# Logger setup
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
 # Environment variables
 API_KEY = os.getenv("GEMINI_API_KEY")
 PORT = int(os.getenv("PORT", 8080))
@@ -69,7 +79,22 @@ if not API_KEY:
     logger.fatal("GEMINI_API_KEY environment variable is required")
     exit(1)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # serve.py warms up before forking; plain uvicorn does it here, in the
+    # background so the port opens at once and /readyz tracks progress.
+    warm_task = None
+    if not warm_state.ready:
+        warm_task = asyncio.create_task(asyncio.to_thread(warm_up, synthesize_speech))
+    yield
+    if warm_task and not warm_task.done():
+        warm_task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.include_router(admin_router)
 
 # CORS middleware (Go equivalent: CheckOrigin returns true)
 app.add_middleware(
@@ -80,15 +105,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-GEMINI_URL = f"wss://generativelanguage.googleapis.com/ws/google.ai.generativelanguage.v1beta.GenerativeService.BidiGenerateContent?key={API_KEY}"
+GEMINI_WS_URL = os.getenv(
+    "GEMINI_WS_URL",
+    "wss://generativelanguage.googleapis.com/ws/google.ai.generativelanguage.v1beta.GenerativeService.BidiGenerateContent",
+)
+GEMINI_URL = f"{GEMINI_WS_URL}?key={API_KEY}"
 
 # Configure GenAI
-# Configure GenAI Client
-client = genai.Client(api_key=API_KEY)
+# Configure GenAI Client (GEMINI_API_BASE_URL points it at e.g. fake_upstream.py)
+GEMINI_API_BASE_URL = os.getenv("GEMINI_API_BASE_URL")
+
+
+def create_genai_client() -> genai.Client:
+    return genai.Client(
+        api_key=API_KEY,
+        http_options=types.HttpOptions(base_url=GEMINI_API_BASE_URL)
+        if GEMINI_API_BASE_URL
+        else None,
+    )
+
+
+client = create_genai_client()
 
 # tts_client removal
 tts_client = None
 
+# Transcript persistence (None unless CONVERSATION_STORE is set)
+conversation_store = create_store()
+
+REGISTRY.register(usage_meter)
+REGISTRY.register(session_registry)
+REGISTRY.register(model_router)
+
 
 class ChatMessage(BaseModel):
     role: str
@@ -102,31 +150,53 @@ class TextToAudioRequest(BaseModel):
     personality: Optional[str] = "フレンドリーで親しみやすい口調を心がけてください"
 
 
-def pcm_to_wav(pcm_data: bytes, sample_rate: int = 24000) -> bytes:
-    """Converts raw PCM data to WAV format."""
-    buffer = io.BytesIO()
-    with wave.open(buffer, "wb") as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(2)  # 16-bit
-        wf.setframerate(sample_rate)
-        wf.writeframes(pcm_data)
-    return buffer.getvalue()
-
-
-def synthesize_speech(text: str) -> str:
-    """Synthesizes speech using Gemini 2.5 Flash TTS model via Generative AI API."""
+def request_uid(authorization: Optional[str]) -> Optional[str]:
+    """Verifies an optional ``Authorization: Bearer <Firebase ID token>``."""
+    if not authorization or not authorization.startswith("Bearer "):
+        return None
+    try:
+        return auth.verify_id_token(authorization.removeprefix("Bearer "))["uid"]
+    except Exception as e:
+        logger.warning("Token verification failed: %s", e)
+        return None
+
+
+def response_outline(resp) -> dict:
+    """Why a generate_content response has no content, without its payload."""
+    feedback = resp.prompt_feedback
+    block_reason = getattr(feedback, "block_reason", None)
+    return {
+        "block_reason": getattr(block_reason, "value", block_reason),
+        "block_message": getattr(feedback, "block_reason_message", None),
+        "finish_reasons": ",".join(
+            str(getattr(c.finish_reason, "value", c.finish_reason))
+            for c in resp.candidates or []
+        ),
+    }
+
+
+def synthesize_speech(text: str, uid: Optional[str] = None) -> tuple[str, dict | None]:
+    """Synthesizes speech using Gemini 2.5 Flash TTS model via Generative AI API.
+
+    Returns the base64 audio and, for PCM output, its mouth-shape envelope.
+    """
+    cached = warm_state.tts_cache.get(text)
+    if cached:
+        return cached
     try:
         # Use the specific TTS model
-        logger.info(f"Synthesizing speech for: {text}")  # LOG
+        logger.info("Synthesizing speech", extra={"text": truncate(text)})
 
         # Request AUDIO modality explicitly
         prompt = f"Please read the following text: {text}"
 
-        resp = client.models.generate_content(
-            model="models/gemini-2.5-flash-preview-tts",
-            contents=prompt,
-            config=types.GenerateContentConfig(response_modalities=["AUDIO"]),
-        )
+        with model_router.call("tts", len(text)) as model:
+            resp = client.models.generate_content(
+                model=model,
+                contents=prompt,
+                config=types.GenerateContentConfig(response_modalities=["AUDIO"]),
+            )
+        usage_meter.record("tts", genai_usage(resp), uid)
 
         # Extract audio data from the first part
         # In new SDK, response structure might differ slightly but usually compatible parts
@@ -135,38 +205,39 @@ def synthesize_speech(text: str) -> str:
                 if part.inline_data:
                     # Log the mime_type to verify format
                     mime_type = part.inline_data.mime_type
-                    logger.info(f"TTS MimeType received: {mime_type}")
+                    logger.info("TTS MimeType received: %s", mime_type)
 
                     audio_data = part.inline_data.data
+                    envelope = None
 
                     if "audio/L16" in mime_type:
                         # Extract sample rate if possible, default to 24000
-                        sample_rate = 24000
-                        if "rate=" in mime_type:
-                            try:
-                                rate_str = mime_type.split("rate=")[1].split(";")[0]
-                                sample_rate = int(rate_str)
-                            except (ValueError, IndexError):
-                                pass
-                        logger.info(f"Converting PCM to WAV (rate={sample_rate})")
+                        sample_rate = pcm_rate(mime_type)
+                        envelope = envelope_payload(audio_data, sample_rate)
+                        logger.info("Converting PCM to WAV (rate=%d)", sample_rate)
                         audio_data = pcm_to_wav(audio_data, sample_rate)
 
                     # Return base64 encoded string directly from the blob
                     # inline_data.data is bytes
-                    return base64.b64encode(audio_data).decode("utf-8")
+                    return base64.b64encode(audio_data).decode("utf-8"), envelope
         else:
-            logger.error(f"TTS Generation failed or blocked. Response: {resp}")
+            logger.error(
+                "TTS Generation failed or blocked", extra=response_outline(resp)
+            )
 
         raise ValueError("No audio content generated")
 
     except Exception as e:
-        logger.error(f"TTS Error: {e}")
+        logger.error("TTS Error: %s", e)
         # Identify if fallback is needed or just re-raise
         raise e
 
 
 @app.post("/chat/text_to_audio")
-async def chat_text_to_audio(request: TextToAudioRequest):
+async def chat_text_to_audio(
+    request: TextToAudioRequest, authorization: Optional[str] = Header(None)
+):
+    uid = request_uid(authorization)
     try:
         # 1. Generate text with Gemini
         system_instruction = f"""あなたは音声アバターです。以下のルールに従ってください：
@@ -188,36 +259,42 @@ async def chat_text_to_audio(request: TextToAudioRequest):
                 types.Content(role=role, parts=[types.Part.from_text(text=m.text)])
             )
 
-        chat = client.chats.create(
-            model="gemini-2.5-flash",
-            history=gemini_history,
-            config=types.GenerateContentConfig(system_instruction=system_instruction),
-        )
-
-        response = chat.send_message(request.text)
+        with model_router.call("chat", len(request.text)) as model:
+            chat = client.chats.create(
+                model=model,
+                history=gemini_history,
+                config=types.GenerateContentConfig(
+                    system_instruction=system_instruction
+                ),
+            )
+            response = chat.send_message(request.text)
+        usage_meter.record("chat", genai_usage(response), uid)
         response_text = response.text
 
         # 2. Synthesize Audio
-        audio_base64 = synthesize_speech(response_text)
+        audio_base64, envelope = synthesize_speech(response_text, uid)
 
         # 3. Return
         return JSONResponse(
             {
                 "text": response_text,
                 "audio": audio_base64,  # base64 mp3
+                "envelope": envelope,
                 "transcript": response_text,
             }
         )
 
     except Exception as e:
-        logger.error(f"Error in text_to_audio: {e}")
+        logger.error("Error in text_to_audio: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/speech-to-speech")
 async def speech_to_speech(
     audio: UploadFile = File(...),
+    authorization: Optional[str] = Header(None),
 ):
+    uid = request_uid(authorization)
     try:
         # Read uploaded audio
         audio_bytes = await audio.read()
@@ -245,13 +322,17 @@ async def speech_to_speech(
             types.Part.from_text(text="ユーザーの音声を聴いて、返答してください。"),
         ]
 
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[types.Content(role="user", parts=prompt_parts)],
-            config=types.GenerateContentConfig(system_instruction=system_instruction),
-        )
+        with model_router.call("speech") as model:
+            response = client.models.generate_content(
+                model=model,
+                contents=[types.Content(role="user", parts=prompt_parts)],
+                config=types.GenerateContentConfig(
+                    system_instruction=system_instruction
+                ),
+            )
+        usage_meter.record("speech", genai_usage(response), uid)
         response_text = response.text
-        logger.info(f"Generated text: '{response_text}'")
+        logger.info("Generated text", extra={"text": truncate(response_text)})
 
         if not response_text:
             logger.warning("Empty text generated from Gemini. Skipping TTS.")
@@ -267,7 +348,7 @@ async def speech_to_speech(
 
         # 2. Synthesize Audio
         # synthesize_speech returns base64 str (MP3 default)
-        audio_b64 = synthesize_speech(response_text)
+        audio_b64, envelope = synthesize_speech(response_text, uid)
 
         # 3. Return as JSON
         # LFM 2.5 server logic also generates text ("text_out").
@@ -275,13 +356,14 @@ async def speech_to_speech(
         return JSONResponse(
             {
                 "audio": audio_b64,
+                "envelope": envelope,
                 "transcript": response_text,
                 "mime_type": "audio/mp3",  # synthesize_speech returns MP3 (or WAV wrapped) base64
             }
         )
 
     except Exception as e:
-        logger.error(f"Error in speech_to_speech: {e}")
+        logger.error("Error in speech_to_speech: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -293,13 +375,51 @@ async def get_version():
             version = data.get("project", {}).get("version", "unknown")
             return {"version": version}
     except Exception as e:
-        logger.error(f"Failed to read version: {e}")
+        logger.error("Failed to read version: %s", e)
         return {"version": "unknown"}
 
 
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    # Only plain uvicorn can answer "warming"; serve.py warms up before bind
+    if not warm_state.ready:
+        return JSONResponse({"status": "warming"}, status_code=503)
+    return {
+        "status": "ready",
+        "fillers": len(warm_state.tts_cache),
+        "warmup_seconds": round(warm_state.seconds, 3),
+    }
+
+
+@app.get("/api/usage")
+async def get_usage(authorization: Optional[str] = Header(None)):
+    """Token totals of the calling user, from Gemini usage metadata.
+
+    Totals are kept in process memory: under serve.py they cover only the
+    worker that answered, identified by ``pid``.
+    """
+    uid = request_uid(authorization)
+    if not uid:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    return {"uid": uid, "pid": os.getpid(), "usage": usage_meter.for_uid(uid)}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return metrics_response()
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
+    session_id = uuid.uuid4().hex[:12]
+    SESSION_ID.set(session_id)
+    session = LiveSession(websocket, session_id)
 
     # 1. Wait for initial configuration message
     user_name = "ユーザー"
@@ -310,6 +430,8 @@ async def websocket_endpoint(websocket: WebSocket):
         # Wait for the first message which should be the config
         # Set a timeout to avoid hanging if client is old version
         init_data = await asyncio.wait_for(websocket.receive_text(), timeout=5.0)
+        if session.recorder:
+            session.recorder.client_config(init_data)
         init_msg = json.loads(init_data)
 
         if init_msg.get("type") == "config":
@@ -324,14 +446,23 @@ async def websocket_endpoint(websocket: WebSocket):
                     # Use name from token if not provided (or overwrite?)
                     # For now just log it
                     logger.info(
-                        f"User authenticated: {user_id}, Name in token: {decoded_token.get('name')}"
+                        "User authenticated",
+                        extra={"uid": user_id, "token_name": decoded_token.get("name")},
                     )
                     # You could verify email_verified etc. here
                 except Exception as e:
-                    logger.warning(f"Token verification failed: {e}")
+                    logger.warning("Token verification failed: %s", e)
+
+            if user_id:
+                session.set_user(user_id, conversation_store)
 
             logger.info(
-                f"Config received: Name={user_name}, Personality={personality}, UID={user_id}"
+                "Config received",
+                extra={
+                    "user_name": truncate(user_name),
+                    "personality": truncate(personality),
+                    "uid": user_id,
+                },
             )
         else:
             # If not config (e.g. audio), we might have lost the first chunk or it's an old client.
@@ -340,7 +471,7 @@ async def websocket_endpoint(websocket: WebSocket):
             logger.warning("First message was not config. Using defaults.")
     except Exception as e:
         logger.warning(
-            f"Failed to receive config (timeout or error): {e}. Using defaults."
+            "Failed to receive config (timeout or error): %s. Using defaults.", e
         )
 
     # Construct System Instruction
@@ -352,118 +483,22 @@ async def websocket_endpoint(websocket: WebSocket):
 - 性格・口調の設定: {personality}
 - 会話の相手として自然に振る舞ってください"""
 
-    try:
-        async with websockets.connect(GEMINI_URL) as gemini_ws:
-            # Send setup message
-            setup_msg = {
-                "setup": {
-                    "model": "models/gemini-2.5-flash-native-audio-preview-12-2025",
-                    "generationConfig": {
-                        "responseModalities": ["AUDIO"],
-                        "speechConfig": {
-                            "voiceConfig": {
-                                "prebuiltVoiceConfig": {"voiceName": "Aoede"}
-                            }
-                        },
-                    },
-                    "systemInstruction": {"parts": [{"text": system_instruction_text}]},
-                    "outputAudioTranscription": {},
-                    "inputAudioTranscription": {},
-                }
-            }
-
-            await gemini_ws.send(json.dumps(setup_msg))
-
-            # Wait for setup response
-            setup_response = await gemini_ws.recv()
-            logger.info(f"Setup response: {setup_response}")
-
-            async def client_to_gemini():
-                try:
-                    while True:
-                        data = await websocket.receive_text()
-                        client_msg = json.loads(data)
-
-                        if client_msg.get("type") == "audio":
-                            gemini_input = {
-                                "realtimeInput": {
-                                    "mediaChunks": [
-                                        {
-                                            "mimeType": "audio/pcm;rate=16000",
-                                            "data": client_msg["audio"],
-                                        }
-                                    ]
-                                }
-                            }
-                            await gemini_ws.send(json.dumps(gemini_input))
-                except WebSocketDisconnect:
-                    logger.info("Client disconnected")
-                except Exception as e:
-                    logger.error(f"Error in client_to_gemini: {e}")
-
-            async def gemini_to_client():
-                try:
-                    while True:
-                        message = await gemini_ws.recv()
-                        response = json.loads(message)
-
-                        server_content = response.get("serverContent", {})
-
-                        # Interruption
-                        if server_content.get("interrupted"):
-                            await websocket.send_json({"type": "interrupted"})
-                            continue
-
-                        # Model Tune (Audio/Text)
-                        model_turn = server_content.get("modelTurn", {})
-                        parts = model_turn.get("parts", [])
-                        for part in parts:
-                            inline_data = part.get("inlineData", {})
-                            if "data" in inline_data:
-                                await websocket.send_json(
-                                    {"type": "audio", "audio": inline_data["data"]}
-                                )
-
-                            text_data = part.get("text")
-                            if text_data:
-                                await websocket.send_json(
-                                    {"type": "text", "text": text_data}
-                                )
-
-                        # Output Transcription
-                        output_transcription = server_content.get(
-                            "outputTranscription", {}
-                        )
-                        if "text" in output_transcription:
-                            await websocket.send_json(
-                                {
-                                    "type": "transcript",
-                                    "text": output_transcription["text"],
-                                }
-                            )
-
-                        # Input Transcription
-                        input_transcription = server_content.get(
-                            "inputTranscription", {}
-                        )
-                        if "text" in input_transcription:
-                            await websocket.send_json(
-                                {
-                                    "type": "user_transcript",
-                                    "text": input_transcription["text"],
-                                }
-                            )
-
-                        # Turn Complete
-                        if server_content.get("turnComplete"):
-                            await websocket.send_json({"type": "turn_complete"})
-
-                except Exception as e:
-                    logger.error(f"Error in gemini_to_client: {e}")
+    setup_msg = {
+        "setup": {
+            "model": f"models/{model_router.choose('live')}",
+            "generationConfig": {
+                "responseModalities": ["AUDIO"],
+                "speechConfig": {
+                    "voiceConfig": {"prebuiltVoiceConfig": {"voiceName": "Aoede"}}
+                },
+            },
+            "systemInstruction": {"parts": [{"text": system_instruction_text}]},
+            "outputAudioTranscription": {},
+            "inputAudioTranscription": {},
+        }
+    }
 
-            # Run both tasks
-            await asyncio.gather(client_to_gemini(), gemini_to_client())
-
-    except Exception as e:
-        logger.error(f"Connection error: {e}")
-        await websocket.close()
+    try:
+        await session.run(GEMINI_URL, setup_msg)
+    finally:
+        await session.close()
@@ -0,0 +1,12 @@
+"""Prometheus metrics, served at ``/metrics``.
+
+Modules register their own collectors on the default registry; this only
+renders it.
+"""
+
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,220 @@
+"""Model registry and latency-aware routing for Gemini calls.
+
+Each role (``chat``, ``speech``, ``tts``, ``live``) has an ordered list of
+candidate models and a latency budget. Every call reports its latency and
+outcome, and ``ModelRouter.choose`` picks the first candidate that
+
+- accepts the request's text length (``max_chars``),
+- has an error rate at most ``MODEL_MAX_ERROR_RATE``, and
+- has a rolling p95 latency within the role's budget,
+
+over the last ``MODEL_WINDOW_SECONDS``. A model with fewer than
+``MODEL_MIN_SAMPLES`` recent calls counts as healthy, so a model that was
+routed around is probed again once its bad samples age out. When no
+candidate qualifies, the healthy one with the lowest p95 is used.
+
+``MODEL_ROUTES`` overrides the defaults with JSON (inline or a file path)::
+
+    {"chat": {"budget_ms": 2500,
+              "models": [{"name": "gemini-2.5-flash", "max_chars": 20000},
+                         "gemini-2.5-flash-lite"]}}
+
+A decision's reason is ``primary`` for the first model of the route,
+``length`` when earlier models were skipped only for ``max_chars``,
+``fallback`` when an earlier eligible model was degraded, and
+``over_budget`` / ``unhealthy`` when no candidate qualified.
+"""
+
+import json
+import logging
+import os
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+MODEL_ROUTES = os.getenv("MODEL_ROUTES")
+WINDOW_SECONDS = float(os.getenv("MODEL_WINDOW_SECONDS", "300"))
+MIN_SAMPLES = int(os.getenv("MODEL_MIN_SAMPLES", "5"))
+MAX_ERROR_RATE = float(os.getenv("MODEL_MAX_ERROR_RATE", "0.2"))
+# Samples kept per (role, model), whatever their age
+MAX_SAMPLES = 500
+
+DEFAULT_ROUTES = {
+    "chat": {
+        "budget_ms": 3000,
+        "models": ["gemini-2.5-flash", "gemini-2.5-flash-lite"],
+    },
+    "speech": {
+        "budget_ms": 4000,
+        "models": ["gemini-2.5-flash", "gemini-2.5-flash-lite"],
+    },
+    # The Pro TTS model is slower and dearer than Flash, so it is no latency
+    # fallback; add alternates through MODEL_ROUTES.
+    "tts": {
+        "budget_ms": 5000,
+        "models": ["gemini-2.5-flash-preview-tts"],
+    },
+    "live": {
+        "budget_ms": 2000,
+        "models": ["gemini-2.5-flash-native-audio-preview-12-2025"],
+    },
+}
+
+
+@dataclass
+class ModelSpec:
+    name: str
+    max_chars: int | None = None
+
+
+@dataclass
+class Route:
+    budget: float  # seconds
+    models: list[ModelSpec]
+
+
+@dataclass
+class ModelStats:
+    """Recent ``(time, latency, ok)`` samples of one model in one role."""
+
+    samples: deque = field(default_factory=lambda: deque(maxlen=MAX_SAMPLES))
+
+    def add(self, seconds: float, ok: bool) -> None:
+        self.samples.append((time.monotonic(), seconds, ok))
+
+    def _recent(self) -> list[tuple[float, float, bool]]:
+        cutoff = time.monotonic() - WINDOW_SECONDS
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        return list(self.samples)
+
+    def summary(self) -> tuple[int, float, float | None]:
+        """Returns ``(count, error rate, p95 latency of successes)``."""
+        recent = self._recent()
+        if not recent:
+            return 0, 0.0, None
+        errors = sum(1 for _, _, ok in recent if not ok)
+        latencies = sorted(seconds for _, seconds, ok in recent if ok)
+        p95 = latencies[int(0.95 * (len(latencies) - 1))] if latencies else None
+        return len(recent), errors / len(recent), p95
+
+
+def load_routes(config: str | None = MODEL_ROUTES) -> dict[str, Route]:
+    """Builds the routes from ``MODEL_ROUTES`` on top of the defaults."""
+    raw = dict(DEFAULT_ROUTES)
+    if config:
+        if os.path.isfile(config):
+            with open(config, encoding="utf-8") as f:
+                config = f.read()
+        raw.update(json.loads(config))
+
+    routes = {}
+    for role, entry in raw.items():
+        models = [
+            ModelSpec(m) if isinstance(m, str) else ModelSpec(**m)
+            for m in entry["models"]
+        ]
+        routes[role] = Route(entry.get("budget_ms", 5000) / 1000, models)
+    return routes
+
+
+class ModelRouter:
+    """Chooses a model per call and keeps the stats the choice is based on."""
+
+    def __init__(self, routes: dict[str, Route]):
+        self.routes = routes
+        self._stats: dict[tuple[str, str], ModelStats] = {}
+        # (role, model, reason) -> calls routed
+        self.decisions: Counter[tuple[str, str, str]] = Counter()
+
+    def _stats_for(self, role: str, model: str) -> ModelStats:
+        stats = self._stats.get((role, model))
+        if stats is None:
+            stats = self._stats[(role, model)] = ModelStats()
+        return stats
+
+    def choose(self, role: str, chars: int = 0) -> str:
+        route = self.routes[role]
+        fits = [
+            m for m in route.models if m.max_chars is None or chars <= m.max_chars
+        ] or route.models
+
+        healthy = []
+        for index, spec in enumerate(fits):
+            if spec is route.models[0]:
+                reason = "primary"
+            else:
+                reason = "fallback" if index else "length"
+            count, error_rate, p95 = self._stats_for(role, spec.name).summary()
+            if count < MIN_SAMPLES:
+                return self._decide(role, spec.name, reason)
+            if error_rate > MAX_ERROR_RATE:
+                continue
+            if p95 is None or p95 <= route.budget:
+                return self._decide(role, spec.name, reason)
+            healthy.append((p95, spec.name))
+
+        if healthy:
+            return self._decide(role, min(healthy)[1], "over_budget")
+        return self._decide(role, fits[0].name, "unhealthy")
+
+    def _decide(self, role: str, model: str, reason: str) -> str:
+        self.decisions[(role, model, reason)] += 1
+        if reason not in ("primary", "length"):
+            logger.info(
+                "Routed around degraded model",
+                extra={"sample": f"route:{role}", "model": model, "reason": reason},
+            )
+        return model
+
+    def observe(self, role: str, model: str, seconds: float, ok: bool) -> None:
+        self._stats_for(role, model).add(seconds, ok)
+
+    @contextmanager
+    def call(self, role: str, chars: int = 0):
+        """Chooses a model and records the latency and outcome of the block."""
+        model = self.choose(role, chars)
+        start = time.perf_counter()
+        try:
+            yield model
+        except Exception:
+            self.observe(role, model, time.perf_counter() - start, ok=False)
+            raise
+        self.observe(role, model, time.perf_counter() - start, ok=True)
+
+    def collect(self):
+        """Prometheus collector hook."""
+        decisions = CounterMetricFamily(
+            "model_route_decisions",
+            "Calls routed to each model",
+            labels=["role", "model", "reason"],
+        )
+        for (role, model, reason), count in list(self.decisions.items()):
+            decisions.add_metric([role, model, reason], count)
+        yield decisions
+
+        p95 = GaugeMetricFamily(
+            "model_latency_p95_seconds",
+            "Rolling p95 latency of successful calls",
+            labels=["role", "model"],
+        )
+        errors = GaugeMetricFamily(
+            "model_error_rate", "Rolling error rate", labels=["role", "model"]
+        )
+        for (role, model), stats in list(self._stats.items()):
+            count, error_rate, latency = stats.summary()
+            if not count:
+                continue
+            errors.add_metric([role, model], error_rate)
+            if latency is not None:
+                p95.add_metric([role, model], latency)
+        yield p95
+        yield errors
+
+
+model_router = ModelRouter(load_routes())
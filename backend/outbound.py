@@ -0,0 +1,99 @@
+"""Per-session coalescing of events sent to the browser.
+
+Gemini Live streams transcripts as many tiny fragments, and one upstream
+message can yield audio, transcript and ``turn_complete`` events at once.
+``OutboundBatcher`` sends all events derived from one upstream message as a
+single frame, and holds transcript-only messages for up to
+``OUTBOUND_BATCH_WINDOW_MS`` so consecutive fragments merge into one.
+
+A frame carrying several events is ``{"type": "batch", "events": [...]}``;
+a single event is sent as is. Events are never reordered: anything other
+than a transcript fragment flushes the held fragments ahead of itself.
+"""
+
+import asyncio
+import os
+from collections.abc import Awaitable, Callable
+
+OUTBOUND_BATCH_WINDOW_MS = float(os.getenv("OUTBOUND_BATCH_WINDOW_MS", "50"))
+
+# Fragments that may be held back and concatenated.
+TRANSCRIPT_TYPES = frozenset({"transcript", "user_transcript"})
+
+
+class OutboundBatcher:
+    """Coalesces the events of one session into as few frames as possible."""
+
+    def __init__(
+        self,
+        send: Callable[[dict], Awaitable[None]],
+        window: float = OUTBOUND_BATCH_WINDOW_MS / 1000,
+    ):
+        self._send = send
+        self.window = window
+        self._pending: list[dict] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._flush_task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self.events_in = 0
+        self.frames_out = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def push(self, events: list[dict]) -> None:
+        """Queues the events of one upstream message."""
+        if not events:
+            return
+        self.events_in += len(events)
+        for event in events:
+            self._append(event)
+        if self.window > 0 and all(e["type"] in TRANSCRIPT_TYPES for e in events):
+            if self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(
+                    self.window, self._on_timer
+                )
+            return
+        await self.flush()
+
+    def _append(self, event: dict) -> None:
+        last = self._pending[-1] if self._pending else None
+        if (
+            last is not None
+            and event["type"] in TRANSCRIPT_TYPES
+            and last["type"] == event["type"]
+        ):
+            self._pending[-1] = {
+                "type": last["type"],
+                "text": last["text"] + event["text"],
+            }
+        else:
+            self._pending.append(event)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._flush_task = asyncio.create_task(self.close())
+
+    async def flush(self) -> None:
+        """Sends everything held so far as one frame."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            if not self._pending:
+                return
+            events, self._pending = self._pending, []
+            frame = (
+                events[0] if len(events) == 1 else {"type": "batch", "events": events}
+            )
+            self.frames_out += 1
+            await self._send(frame)
+
+    async def close(self) -> None:
+        """Flushes held fragments; safe to call on a dead socket."""
+        try:
+            await self.flush()
+        except Exception:
+            # The client may already be gone
+            pass
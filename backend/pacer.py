@@ -0,0 +1,123 @@
+"""Real-time pacing of Live model audio towards the browser.
+
+Gemini Live produces audio faster than real time, so without pacing a whole
+reply lands in the browser's playback queue at once and an ``interrupted``
+cannot stop what was already sent. When ``AUDIO_PACING_LEAD_MS`` is set,
+``AudioPacer`` sits in front of the ``OutboundBatcher`` and releases the
+events of each upstream message once the audio sent so far has less than
+the lead left to play. The client then holds at most about the lead.
+
+Messages stay in order; one without audio waits behind queued audio, so
+transcripts stay in step with speech. On ``interrupted`` the queued model
+audio and its transcript are dropped, the remaining events are sent at once
+followed by the interruption, and the playback clock is reset.
+"""
+
+import asyncio
+import os
+from collections import deque
+from collections.abc import Awaitable, Callable
+
+AUDIO_PACING_LEAD_MS = float(os.getenv("AUDIO_PACING_LEAD_MS", "0"))
+
+# Live output audio: 24 kHz, 16-bit mono
+OUTPUT_BYTES_PER_SECOND = 24000 * 2
+
+# Model output that is meaningless once the audio it belongs to is dropped
+_MODEL_OUTPUT_TYPES = frozenset({"audio", "transcript", "text"})
+
+
+def audio_seconds(events: list[dict]) -> float:
+    """Playback time of the audio events, from their base64 length."""
+    size = 0
+    for event in events:
+        if event["type"] == "audio":
+            data = event["audio"]
+            size += len(data) * 3 // 4 - data.endswith("=") - data.endswith("==")
+    return size / OUTPUT_BYTES_PER_SECOND
+
+
+class AudioPacer:
+    """Releases one session's audio at playback rate plus ``lead``."""
+
+    def __init__(
+        self,
+        push: Callable[[list[dict]], Awaitable[None]],
+        lead: float = AUDIO_PACING_LEAD_MS / 1000,
+    ):
+        self._push = push
+        self.lead = lead
+        # (events of one upstream message, their audio seconds)
+        self._queue: deque[tuple[list[dict], float]] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # Loop time at which the audio released so far finishes playing
+        self._play_until = 0.0
+        self.dropped_seconds = 0.0
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    @property
+    def buffered_seconds(self) -> float:
+        """Audio the client is estimated to hold, released but not played."""
+        return max(0.0, self._play_until - asyncio.get_running_loop().time())
+
+    async def push(self, events: list[dict]) -> None:
+        """Queues the events of one upstream message."""
+        if not events:
+            return
+        if any(e["type"] == "interrupted" for e in events):
+            await self._interrupt(events)
+            return
+        seconds = audio_seconds(events)
+        if not seconds and not self._queue:
+            await self._push(events)
+            return
+        self._queue.append((events, seconds))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _interrupt(self, events: list[dict]) -> None:
+        kept = []
+        for queued, seconds in self._queue:
+            kept.extend(e for e in queued if e["type"] not in _MODEL_OUTPUT_TYPES)
+            self.dropped_seconds += seconds
+        self._queue.clear()
+        self._wakeup.set()
+        self._play_until = asyncio.get_running_loop().time()
+        await self._push(kept + events)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._queue:
+            events, seconds = self._queue[0]
+            wait = self._play_until - self.lead - loop.time()
+            if seconds and wait > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except TimeoutError:
+                    pass
+                # The queue may have been dropped meanwhile
+                continue
+            self._queue.popleft()
+            if seconds:
+                self._play_until = max(self._play_until, loop.time()) + seconds
+            await self._push(events)
+
+    async def close(self) -> None:
+        """Sends whatever is still queued, unpaced; safe on a dead socket."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        events = [e for queued, _ in self._queue for e in queued]
+        self._queue.clear()
+        if not events:
+            return
+        try:
+            await self._push(events)
+        except Exception:
+            # The client may already be gone
+            pass
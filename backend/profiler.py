@@ -0,0 +1,126 @@
+"""On-demand CPU sampling and heap tracing for a running process.
+
+Nothing here runs until an admin endpoint asks for it: the CPU profiler is a
+thread that exists only for the duration of a profile, and ``tracemalloc``
+is off until started. Both are meant to stay in production builds.
+
+CPU profiles are returned in the collapsed-stack format (one
+``thread;outer;...;inner count`` line per distinct stack) that
+``flamegraph.pl``, speedscope and inferno read directly.
+"""
+
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+# tracemalloc's own bookkeeping, hidden from snapshots
+_TRACEMALLOC_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+]
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{frame.f_lineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads every ``interval`` seconds."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    def profile(
+        self, seconds: float, interval: float | None = None
+    ) -> tuple[Counter[str], int]:
+        """Blocks for ``seconds``; returns stack counts and samples taken.
+
+        Raises RuntimeError when a profile is already running.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        interval = interval or self.interval
+        try:
+            own = threading.get_ident()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks: Counter[str] = Counter()
+            samples = 0
+            end = time.monotonic() + seconds
+            while time.monotonic() < end:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(_frame_label(frame))
+                        frame = frame.f_back
+                    labels.append(names.get(ident, str(ident)))
+                    stacks[";".join(reversed(labels))] += 1
+                samples += 1
+                time.sleep(interval)
+            return stacks, samples
+        finally:
+            self._lock.release()
+
+
+def collapsed(stacks: Counter[str]) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class HeapTracer:
+    """``tracemalloc`` start/stop plus snapshot diffs against the last one."""
+
+    def __init__(self):
+        self._previous: tracemalloc.Snapshot | None = None
+
+    def start(self, frames: int = 1) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._previous = None
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+        self._previous = None
+
+    def snapshot(self, limit: int = 25, key: str = "lineno") -> dict:
+        """Top allocations, and growth since the previous snapshot if any.
+
+        Raises RuntimeError when tracing is off.
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_TRACEMALLOC_FILTERS)
+        current, peak = tracemalloc.get_traced_memory()
+        result = {
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [
+                {
+                    "where": str(stat.traceback),
+                    "bytes": stat.size,
+                    "blocks": stat.count,
+                }
+                for stat in snapshot.statistics(key)[:limit]
+            ],
+        }
+        if self._previous is not None:
+            result["diff"] = [
+                {
+                    "where": str(stat.traceback),
+                    "bytes": stat.size,
+                    "bytes_diff": stat.size_diff,
+                    "blocks_diff": stat.count_diff,
+                }
+                for stat in snapshot.compare_to(self._previous, key)[:limit]
+            ]
+        self._previous = snapshot
+        return result
+
+
+sampling_profiler = SamplingProfiler()
+heap_tracer = HeapTracer()
@@ -0,0 +1,63 @@
+"""Per-message translation between the browser and the Gemini Live API.
+
+These run once per audio frame in each direction, so they are kept free of
+I/O to make them easy to benchmark (see ``benchmarks/run.py``).
+"""
+
+import base64
+import json
+
+from audio import envelope_payload, pcm_rate
+
+
+def realtime_input(audio_b64: str) -> str:
+    """Wraps a base64 16 kHz PCM chunk from the client for Gemini."""
+    return json.dumps(
+        {
+            "realtimeInput": {
+                "mediaChunks": [{"mimeType": "audio/pcm;rate=16000", "data": audio_b64}]
+            }
+        }
+    )
+
+
+def server_events(response: dict) -> list[dict]:
+    """Returns the client events for one Gemini Live message, in order."""
+    server_content = response.get("serverContent", {})
+
+    # Interruption
+    if server_content.get("interrupted"):
+        return [{"type": "interrupted"}]
+
+    events = []
+
+    # Model Turn (Audio/Text)
+    model_turn = server_content.get("modelTurn", {})
+    for part in model_turn.get("parts", []):
+        inline_data = part.get("inlineData", {})
+        if "data" in inline_data:
+            pcm = base64.b64decode(inline_data["data"])
+            envelope = envelope_payload(pcm, pcm_rate(inline_data.get("mimeType")))
+            events.append(
+                {"type": "audio", "audio": inline_data["data"], "envelope": envelope}
+            )
+
+        text_data = part.get("text")
+        if text_data:
+            events.append({"type": "text", "text": text_data})
+
+    # Output Transcription
+    output_transcription = server_content.get("outputTranscription", {})
+    if "text" in output_transcription:
+        events.append({"type": "transcript", "text": output_transcription["text"]})
+
+    # Input Transcription
+    input_transcription = server_content.get("inputTranscription", {})
+    if "text" in input_transcription:
+        events.append({"type": "user_transcript", "text": input_transcription["text"]})
+
+    # Turn Complete
+    if server_content.get("turnComplete"):
+        events.append({"type": "turn_complete"})
+
+    return events
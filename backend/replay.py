@@ -0,0 +1,293 @@
+"""Replays recorded ``/ws`` sessions against a local backend.
+
+Starts ``fake_upstream`` with the upstream side of each recording, launches
+the backend pointed at it (or uses ``--backend-url``), and drives one client
+per recording that sends the recorded client frames at their original
+timing, scaled by ``--speed``. Sessions start with the same spacing they had
+in production.
+
+The JSON report (frame/byte throughput and relay latency percentiles, i.e.
+the delay between the fake upstream sending a message and the client
+receiving the frame it produced) is meant to be diffed between releases::
+
+    uv run python replay.py recordings/*.rec --speed 4 --report new.json
+    uv run python replay.py recordings/*.rec --compare old.json
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import uvicorn
+import websockets
+
+from fake_upstream import FakeUpstream, load_upstream_timeline
+from session_recorder import KIND_CLIENT, Recording
+
+# How long a client keeps listening after its timeline is exhausted.
+DRAIN_TIMEOUT = 2.0
+
+
+def load_client_timeline(path: str) -> tuple[int, list[tuple[float, str]]]:
+    """Returns the session start (us) and its ``(offset s, frame)`` list."""
+    recording = Recording(path)
+    try:
+        frames = [
+            (record.offset_us / 1_000_000, bytes(record.payload).decode("utf-8"))
+            for record in recording
+            if record.kind == KIND_CLIENT
+        ]
+        return recording.start_us, frames
+    finally:
+        recording.close()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def with_replay_name(
+    frames: list[tuple[float, str]], name: str
+) -> list[tuple[float, str]]:
+    """Client frames starting with a config frame whose ``userName`` is ``name``.
+
+    The name selects the recording on the fake upstream. A recording whose
+    first frame is not a config (the backend swallows whatever comes first)
+    gets a synthetic one in front.
+    """
+    if frames:
+        offset, first = frames[0]
+        try:
+            msg = json.loads(first)
+        except ValueError:
+            msg = None
+        if isinstance(msg, dict) and msg.get("type") == "config":
+            msg["userName"] = name
+            return [(offset, json.dumps(msg, ensure_ascii=False)), *frames[1:]]
+    return [(0.0, json.dumps({"type": "config", "userName": name})), *frames]
+
+
+async def run_client(backend_url, name, frames, delay, speed, last_upstream):
+    """Plays one session's client frames and collects receive times."""
+    frames = with_replay_name(frames, name)
+    await asyncio.sleep(delay)
+    received: list[tuple[float, int]] = []
+    async with websockets.connect(backend_url, max_size=None) as ws:
+
+        async def reader():
+            async for message in ws:
+                received.append((time.perf_counter(), len(message)))
+
+        reader_task = asyncio.create_task(reader())
+        start = time.perf_counter()
+        for offset, frame in frames:
+            wait = start + offset / speed - time.perf_counter()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await ws.send(frame)
+
+        end = start + last_upstream / speed
+        while True:
+            seen = len(received)
+            await asyncio.sleep(max(end - time.perf_counter(), 0) + DRAIN_TIMEOUT)
+            if len(received) == seen:
+                break
+        reader_task.cancel()
+    return {"name": name, "frames_sent": len(frames), "received": received}
+
+
+def summarize(results, fake: FakeUpstream, wall_time: float, speed: float) -> dict:
+    latencies = []
+    per_session = []
+    total_frames = total_bytes = 0
+    for result in results:
+        sent = fake.sent_at.get(result["name"], [])
+        session_latencies = []
+        for recv_time, _ in result["received"]:
+            i = bisect.bisect_right(sent, recv_time)
+            if i:
+                session_latencies.append((recv_time - sent[i - 1]) * 1000)
+        frames = len(result["received"])
+        size = sum(n for _, n in result["received"])
+        total_frames += frames
+        total_bytes += size
+        latencies.extend(session_latencies)
+        per_session.append(
+            {
+                "name": result["name"],
+                "client_frames_sent": result["frames_sent"],
+                "upstream_frames_received": fake.frames_received.get(result["name"], 0),
+                "upstream_messages_sent": len(sent),
+                "frames_received": frames,
+                "bytes_received": size,
+                "latency_ms_p95": round(percentile(session_latencies, 95), 3),
+            }
+        )
+    return {
+        "speed": speed,
+        "sessions": len(results),
+        "wall_time_s": round(wall_time, 3),
+        "frames_received": total_frames,
+        "bytes_received": total_bytes,
+        "frames_per_s": round(total_frames / wall_time, 2) if wall_time else 0,
+        "bytes_per_s": round(total_bytes / wall_time, 2) if wall_time else 0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 3) if latencies else 0,
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(max(latencies, default=0), 3),
+        },
+        "per_session": per_session,
+    }
+
+
+def compare(old: dict, new: dict) -> None:
+    """Prints the change of every top-level and latency metric."""
+    rows = [(k, old.get(k), new.get(k)) for k in new if k != "per_session"]
+    rows = [r for r in rows if not isinstance(r[2], dict)]
+    rows += [
+        (f"latency_ms.{k}", old.get("latency_ms", {}).get(k), v)
+        for k, v in new["latency_ms"].items()
+    ]
+    for key, before, after in rows:
+        if isinstance(before, (int, float)) and before:
+            change = f"{(after - before) / before * 100:+.1f}%"
+        else:
+            change = "n/a"
+        print(f"{key:20} {before!s:>14} -> {after!s:>14}  {change}")
+
+
+def start_backend(port: int, fake_port: int, serve: bool = False) -> subprocess.Popen:
+    """Starts the backend on ``uvicorn``, or with ``serve.py`` if ``serve``."""
+    env = dict(
+        os.environ,
+        GEMINI_API_KEY=os.getenv("GEMINI_API_KEY", "replay"),
+        GEMINI_WS_URL=f"ws://127.0.0.1:{fake_port}/ws",
+        GEMINI_API_BASE_URL=f"http://127.0.0.1:{fake_port}",
+        LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+        PORT=str(port),
+    )
+    env.pop("SESSION_RECORD_DIR", None)
+    if serve:
+        cmd = [sys.executable, "serve.py"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)]
+        cmd += ["--log-level", "warning"]
+    return subprocess.Popen(cmd, env=env, cwd=os.path.dirname(__file__) or ".")
+
+
+async def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def replay(args) -> dict:
+    sessions = {}
+    for i, path in enumerate(args.recordings):
+        start_us, frames = load_client_timeline(path)
+        upstream = load_upstream_timeline(path)
+        sessions[f"replay-{i}"] = (start_us, frames, upstream)
+
+    fake = FakeUpstream(
+        {name: upstream for name, (_, _, upstream) in sessions.items()}, args.speed
+    )
+    fake_port = args.fake_port or free_port()
+    fake_server = uvicorn.Server(
+        uvicorn.Config(
+            fake.create_app(),
+            port=fake_port,
+            log_level="warning",
+            timeout_graceful_shutdown=1,
+        )
+    )
+    fake_task = asyncio.create_task(fake_server.serve())
+    await wait_for_port(fake_port)
+
+    backend = None
+    backend_url = args.backend_url
+    if not backend_url:
+        port = free_port()
+        backend = start_backend(port, fake_port)
+        backend_url = f"ws://127.0.0.1:{port}/ws"
+        await wait_for_port(port)
+    else:
+        print(f"Fake upstream listening on ws://127.0.0.1:{fake_port}/ws")
+
+    try:
+        first_start = min(start_us for start_us, _, _ in sessions.values())
+        began = time.perf_counter()
+        results = await asyncio.gather(
+            *(
+                run_client(
+                    backend_url,
+                    name,
+                    frames,
+                    (start_us - first_start) / 1_000_000 / args.speed,
+                    args.speed,
+                    upstream[-1][0] if upstream else 0.0,
+                )
+                for name, (start_us, frames, upstream) in sessions.items()
+            )
+        )
+        wall_time = time.perf_counter() - began
+    finally:
+        if backend:
+            backend.terminate()
+            backend.wait()
+        fake_server.should_exit = True
+        await fake_task
+
+    return summarize(results, fake, wall_time, args.speed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recordings", nargs="+", help="*.rec files to replay")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="1 = real time, 4 = 4x faster"
+    )
+    parser.add_argument("--backend-url", help="use a running backend instead")
+    parser.add_argument("--fake-port", type=int, help="port for the fake upstream")
+    parser.add_argument("--report", help="write the JSON report to this path")
+    parser.add_argument("--compare", help="previous report to diff against")
+    args = parser.parse_args()
+
+    report = asyncio.run(replay(args))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    else:
+        print(json.dumps({k: v for k, v in report.items() if k != "per_session"}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Production entry point: gunicorn pre-fork master with uvicorn workers.
+
+The app is imported and warmed up once in the master (``preload_app``), then
+forked, so workers share the imported modules and warmed TTS assets
+copy-on-write. Warm-up finishes before the port is bound, so ``/readyz``
+never answers "warming" here; readiness is simply the port accepting
+connections. The 503 state only exists under plain ``uvicorn``, which warms
+up in the background after binding.
+Workers run uvicorn on uvloop with the httptools parser.
+
+Settings (environment):
+
+- ``PORT``: listen port (default 8080)
+- ``WEB_CONCURRENCY``: worker count, default one per CPU available to the
+  container (cgroup quota aware)
+- ``WORKER_TIMEOUT`` / ``GRACEFUL_TIMEOUT``: seconds before a silent worker
+  is killed / in-flight sessions get on shutdown (defaults 60 / 30)
+
+Each worker keeps its own sessions, ``/metrics`` counters and token usage,
+so ``/metrics`` and ``/api/usage`` answer for whichever worker took the
+request (its ``pid`` is in the ``/api/usage`` response), counted since that
+worker forked.
+
+Run with ``python serve.py``; ``uvicorn main:app`` stays the development
+entry point.
+"""
+
+import math
+import os
+
+from gunicorn.app.base import BaseApplication
+from uvicorn_worker import UvicornWorker
+
+from log_config import setup_logging
+
+
+def available_cpus() -> int:
+    """CPUs this process may use, honouring a cgroup v2 CPU quota."""
+    cpus = len(os.sched_getaffinity(0))
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+PORT = int(os.getenv("PORT", 8080))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY") or available_cpus())
+WORKER_TIMEOUT = int(os.getenv("WORKER_TIMEOUT", "60"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+
+
+class Worker(UvicornWorker):
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
+
+
+def post_fork(server, worker):
+    # The log listener thread started at import does not survive the fork.
+    setup_logging()
+
+
+class Server(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        import main
+        from warmup import warm_up
+
+        warm_up(main.synthesize_speech)
+        # Connections opened while warming must not be shared between workers
+        main.client = main.create_genai_client()
+        return main.app
+
+
+if __name__ == "__main__":
+    Server(
+        {
+            "bind": f"0.0.0.0:{PORT}",
+            "workers": WEB_CONCURRENCY,
+            "worker_class": Worker,
+            "preload_app": True,
+            "post_fork": post_fork,
+            "timeout": WORKER_TIMEOUT,
+            "graceful_timeout": GRACEFUL_TIMEOUT,
+            "forwarded_allow_ips": "*",
+        }
+    ).run()
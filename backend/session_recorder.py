@@ -0,0 +1,119 @@
+"""Opt-in per-session traffic recorder for ``/ws``.
+
+When ``SESSION_RECORD_DIR`` is set, every websocket session is written to
+``<dir>/<session_id>.rec``: client frames and upstream Gemini messages with
+their arrival time, so ``replay.py`` can reproduce the session's timing.
+
+File layout (little endian), append-only::
+
+    header:  magic b"AVREC" | version u8 | start time (unix epoch, us) u64
+    record:  offset from start (us) u64 | kind u8 | length u32 | payload
+
+Records are fixed-header + payload so a reader can walk an ``mmap`` of the
+file without parsing or copying payloads it does not need.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from collections.abc import Iterator
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+SESSION_RECORD_DIR = os.getenv("SESSION_RECORD_DIR")
+
+MAGIC = b"AVREC"
+VERSION = 1
+HEADER = struct.Struct("<5sBQ")
+RECORD = struct.Struct("<QBI")
+
+KIND_CLIENT = 1
+KIND_UPSTREAM = 2
+
+
+class Record(NamedTuple):
+    offset_us: int
+    kind: int
+    payload: memoryview
+
+
+class SessionRecorder:
+    """Appends the frames of one session to a recording file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "wb", buffering=64 * 1024)  # noqa: SIM115
+        self._start_ns = time.monotonic_ns()
+        self._file.write(HEADER.pack(MAGIC, VERSION, time.time_ns() // 1000))
+
+    def _append(self, kind: int, data: str | bytes) -> None:
+        if self._file.closed:
+            return
+        payload = data.encode("utf-8") if isinstance(data, str) else data
+        offset_us = (time.monotonic_ns() - self._start_ns) // 1000
+        self._file.write(RECORD.pack(offset_us, kind, len(payload)))
+        self._file.write(payload)
+
+    def client(self, data: str) -> None:
+        self._append(KIND_CLIENT, data)
+
+    def client_config(self, data: str) -> None:
+        """Records the config frame with the Firebase token stripped."""
+        try:
+            msg = json.loads(data)
+            msg.pop("token", None)
+            data = json.dumps(msg, ensure_ascii=False)
+        except (ValueError, AttributeError):
+            pass
+        self._append(KIND_CLIENT, data)
+
+    def upstream(self, data: str | bytes) -> None:
+        self._append(KIND_UPSTREAM, data)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+def open_recorder(session_id: str) -> SessionRecorder | None:
+    """Returns a recorder for the session, or None when recording is off."""
+    if not SESSION_RECORD_DIR:
+        return None
+    try:
+        os.makedirs(SESSION_RECORD_DIR, exist_ok=True)
+        return SessionRecorder(os.path.join(SESSION_RECORD_DIR, f"{session_id}.rec"))
+    except OSError as e:
+        logger.warning("Session recording disabled: %s", e)
+        return None
+
+
+class Recording:
+    """Read-only, memory-mapped view of a recording file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.start_us = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a session recording")
+
+    def __iter__(self) -> Iterator[Record]:
+        view = memoryview(self._mmap)
+        pos = HEADER.size
+        end = len(view)
+        while pos + RECORD.size <= end:
+            offset_us, kind, length = RECORD.unpack_from(view, pos)
+            pos += RECORD.size
+            if pos + length > end:
+                break  # truncated tail from a crashed writer
+            yield Record(offset_us, kind, view[pos : pos + length])
+            pos += length
+
+    def close(self) -> None:
+        self._mmap.close()
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import admin
+from profiler import HeapTracer, SamplingProfiler
+
+TOKEN = "s3cret"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", TOKEN)
+    monkeypatch.setattr(admin, "heap_tracer", HeapTracer())
+    app = FastAPI()
+    app.include_router(admin.router)
+    with TestClient(app) as client:
+        yield client
+    admin.heap_tracer.stop()
+
+
+def test_admin_is_hidden_without_a_token(monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", None)
+    app = FastAPI()
+    app.include_router(admin.router)
+    response = TestClient(app).get("/admin/sessions")
+    assert response.status_code == 404
+
+
+def test_wrong_or_non_ascii_token_is_forbidden(client):
+    assert client.get("/admin/sessions").status_code == 403
+    wrong = client.get("/admin/sessions", headers={"X-Admin-Token": "nope"})
+    assert wrong.status_code == 403
+    non_ascii = client.get(
+        "/admin/sessions", headers={"X-Admin-Token": "é".encode("latin-1")}
+    )
+    assert non_ascii.status_code == 403
+
+
+def test_sessions_with_the_token(client):
+    response = client.get("/admin/sessions", headers={"X-Admin-Token": TOKEN})
+    assert response.status_code == 200
+    assert "sessions" in response.json()
+
+
+def test_heap_snapshot_needs_start_and_diffs_the_second_call(client):
+    headers = {"X-Admin-Token": TOKEN}
+    before = client.post("/admin/tracemalloc/snapshot", headers=headers)
+    assert before.status_code == 409
+
+    client.post("/admin/tracemalloc/start", headers=headers)
+    first = client.post("/admin/tracemalloc/snapshot?limit=5", headers=headers)
+    assert first.status_code == 200
+    assert "diff" not in first.json()
+    second = client.post("/admin/tracemalloc/snapshot?limit=5", headers=headers)
+    assert "diff" in second.json()
+
+
+def test_profile_refuses_to_run_twice():
+    profiler = SamplingProfiler(interval=0.001)
+    thread = threading.Thread(target=profiler.profile, args=(0.3,))
+    thread.start()
+    # Give the first profile time to take the lock
+    time.sleep(0.05)
+    with pytest.raises(RuntimeError):
+        profiler.profile(0.01)
+    thread.join()
+    _, samples = profiler.profile(0.02)
+    assert samples > 0
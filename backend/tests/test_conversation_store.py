@@ -0,0 +1,84 @@
+import asyncio
+
+import conversation_store
+from conversation_store import ConversationWriter, InMemoryStore
+
+
+def turn_events(i: int) -> list[dict]:
+    return [
+        {"type": "user_transcript", "text": f"question {i}"},
+        {"type": "transcript", "text": f"answer {i}"},
+        {"type": "turn_complete"},
+    ]
+
+
+def test_writer_commits_turns_in_order():
+    async def scenario():
+        store = InMemoryStore()
+        writer = ConversationWriter(store, "u1", "s1")
+        for i in range(3):
+            writer.observe(turn_events(i))
+        await writer.close()
+        return store, writer
+
+    store, writer = asyncio.run(scenario())
+    turns = store.turns[("u1", "s1")]
+    assert [(t["seq"], t["role"], t["text"]) for t in turns] == [
+        (0, "user", "question 0"),
+        (1, "model", "answer 0"),
+        (2, "user", "question 1"),
+        (3, "model", "answer 1"),
+        (4, "user", "question 2"),
+        (5, "model", "answer 2"),
+    ]
+    assert writer.flushed == 6
+    assert writer.dropped == 0
+    assert store.commits == 1
+
+
+def test_buffer_cap_drops_oldest_turns(monkeypatch):
+    monkeypatch.setattr(conversation_store, "MAX_BUFFERED_TURNS", 4)
+    monkeypatch.setattr(conversation_store, "FLUSH_TURNS", 100)
+
+    async def scenario():
+        store = InMemoryStore()
+        writer = ConversationWriter(store, "u1", "s1")
+        for i in range(3):
+            writer.observe(turn_events(i))
+        await writer.close()
+        return store, writer
+
+    store, writer = asyncio.run(scenario())
+    assert [t["seq"] for t in store.turns[("u1", "s1")]] == [2, 3, 4, 5]
+    assert writer.dropped == 2
+
+
+def test_close_gives_up_on_a_stuck_store():
+    async def scenario():
+        store = InMemoryStore(delay=0.5)
+        writer = ConversationWriter(store, "u1", "s1")
+        writer.observe(turn_events(0))
+        await writer.close(timeout=0.05)
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert writer.buffered == 0
+    assert writer.flushed == 0
+
+
+class FailingStore:
+    def commit(self, uid: str, session_id: str, turns: list[dict]) -> None:
+        raise RuntimeError("unavailable")
+
+
+def test_close_counts_turns_a_failing_store_never_took():
+    async def scenario():
+        writer = ConversationWriter(FailingStore(), "u1", "s1")
+        writer.observe(turn_events(0))
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert writer.buffered == 0
+    assert writer.flushed == 0
+    assert writer.dropped == 2
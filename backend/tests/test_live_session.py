@@ -0,0 +1,103 @@
+import asyncio
+import base64
+import json
+
+import pytest
+from websockets.protocol import State
+
+from live_session import LiveSession, SessionRegistry
+from pacer import OUTPUT_BYTES_PER_SECOND, AudioPacer
+from usage import usage_meter
+
+
+def audio_message(seconds: float) -> str:
+    data = base64.b64encode(bytes(int(OUTPUT_BYTES_PER_SECOND * seconds)))
+    part = {"inlineData": {"mimeType": "audio/pcm", "data": data.decode("ascii")}}
+    return json.dumps({"serverContent": {"modelTurn": {"parts": [part]}}})
+
+
+class FakeClient:
+    def __init__(self):
+        self.sent: list[dict] = []
+        self.fail = asyncio.Event()
+
+    async def receive_text(self) -> str:
+        await self.fail.wait()
+        return "not json"
+
+    async def send_json(self, data: dict) -> None:
+        self.sent.append(data)
+
+    async def close(self) -> None:
+        pass
+
+
+class FakeUpstream:
+    def __init__(self, messages: list[str] = ()):
+        self.messages = list(messages)
+        self.state = State.OPEN
+
+    async def send(self, data: str) -> None:
+        pass
+
+    async def recv(self) -> str:
+        if self.messages:
+            return self.messages.pop(0)
+        await asyncio.Event().wait()
+
+
+def sent_events(frames: list[dict]) -> list[dict]:
+    return [e for f in frames for e in (f["events"] if f["type"] == "batch" else [f])]
+
+
+def test_relay_failure_flushes_paced_audio():
+    async def scenario():
+        client = FakeClient()
+        session = LiveSession(client, "s1", registry=SessionRegistry())
+        session.pacer = AudioPacer(session.batcher.push, lead=0.1)
+        upstream = FakeUpstream([audio_message(1.0), audio_message(1.0)])
+
+        async def fail_soon():
+            # The second message is held by the pacer by now
+            while session.pacer.pending == 0:
+                await asyncio.sleep(0.01)
+            client.fail.set()
+
+        failer = asyncio.create_task(fail_soon())
+        with pytest.raises(json.JSONDecodeError):
+            await session._relay(upstream)
+        await failer
+        return client, session
+
+    client, session = asyncio.run(scenario())
+    assert session.pacer.pending == 0
+    assert session.pacer._task is None or session.pacer._task.done()
+    audio = [e for e in sent_events(client.sent) if e["type"] == "audio"]
+    assert len(audio) == 2
+
+
+def test_leaked_upstreams_counts_open_sockets_without_a_session():
+    registry = SessionRegistry()
+    session = LiveSession(FakeClient(), "s1", registry=registry)
+    held, orphan, closed = FakeUpstream(), FakeUpstream(), FakeUpstream()
+    closed.state = State.CLOSED
+    for ws in (held, orphan, closed):
+        registry.track_upstream(ws)
+    session.upstream = held
+    assert registry.leaked_upstreams() == 1
+
+    registry.remove(session)
+    assert registry.leaked_upstreams() == 2
+
+
+def test_stats_and_end_of_session_carry_token_usage():
+    async def scenario():
+        session = LiveSession(FakeClient(), "s-usage", registry=SessionRegistry())
+        usage_meter.record("live", {("prompt", "all"): 7}, None, "s-usage")
+        stats = session.stats()
+        await session.close()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["usage"] == {"prompt": {"all": 7}}
+    assert usage_meter.for_session("s-usage") == {}
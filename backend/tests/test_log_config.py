@@ -0,0 +1,33 @@
+import logging
+
+from log_config import _DeferredQueueHandler, truncate
+
+
+class ListQueue(list):
+    def put_nowait(self, item):
+        self.append(item)
+
+
+def make_record(msg, *args):
+    return logging.LogRecord("t", logging.INFO, __file__, 1, msg, args, None)
+
+
+def test_mutable_args_are_rendered_at_call_time():
+    handler = _DeferredQueueHandler(ListQueue())
+    items = ["a"]
+    record = handler.prepare(make_record("items: %s", items))
+    items.append("b")
+    assert record.getMessage() == "items: ['a']"
+    assert record.args is None
+
+
+def test_immutable_args_are_left_for_the_listener():
+    handler = _DeferredQueueHandler(ListQueue())
+    record = handler.prepare(make_record("%s took %.1f s", "tts", 1.25))
+    assert record.args == ("tts", 1.25)
+    assert record.getMessage() == "tts took 1.2 s"
+
+
+def test_truncate_decodes_bytes():
+    assert truncate(b'{"setupComplete": {}}') == '{"setupComplete": {}}'
+    assert truncate("あいう".encode() * 10, 6) == "あい...(+84 bytes)"
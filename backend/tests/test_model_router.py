@@ -0,0 +1,74 @@
+import model_router
+from model_router import ModelRouter, ModelSpec, Route
+
+
+def make_router() -> ModelRouter:
+    return ModelRouter(
+        {
+            "chat": Route(
+                budget=1.0,
+                models=[
+                    ModelSpec("primary", max_chars=100),
+                    ModelSpec("fallback"),
+                    ModelSpec("spare"),
+                ],
+            )
+        }
+    )
+
+
+def observe(router, model, seconds, ok=True, times=model_router.MIN_SAMPLES):
+    for _ in range(times):
+        router.observe("chat", model, seconds, ok)
+
+
+def reasons(router) -> set[tuple[str, str]]:
+    return {(model, reason) for _, model, reason in router.decisions}
+
+
+def test_primary_while_under_min_samples():
+    router = make_router()
+    observe(router, "primary", 9.0, times=model_router.MIN_SAMPLES - 1)
+    assert router.choose("chat") == "primary"
+    assert reasons(router) == {("primary", "primary")}
+
+
+def test_fallback_when_primary_p95_is_over_budget():
+    router = make_router()
+    observe(router, "primary", 2.0)
+    assert router.choose("chat") == "fallback"
+    assert reasons(router) == {("fallback", "fallback")}
+
+
+def test_model_with_too_many_errors_is_skipped():
+    router = make_router()
+    observe(router, "primary", 0.1, ok=False)
+    observe(router, "fallback", 0.1, ok=False)
+    assert router.choose("chat") == "spare"
+
+
+def test_over_budget_picks_the_lowest_p95():
+    router = make_router()
+    observe(router, "primary", 3.0)
+    observe(router, "fallback", 1.5)
+    observe(router, "spare", 2.0)
+    assert router.choose("chat") == "fallback"
+    assert reasons(router) == {("fallback", "over_budget")}
+
+
+def test_unhealthy_falls_back_to_the_first_candidate():
+    router = make_router()
+    for model in ("primary", "fallback", "spare"):
+        observe(router, model, 0.1, ok=False)
+    assert router.choose("chat") == "primary"
+    assert reasons(router) == {("primary", "unhealthy")}
+
+
+def test_max_chars_filter_is_a_length_pick():
+    router = make_router()
+    assert router.choose("chat", chars=500) == "fallback"
+    assert reasons(router) == {("fallback", "length")}
+
+    observe(router, "fallback", 2.0)
+    assert router.choose("chat", chars=500) == "spare"
+    assert ("spare", "fallback") in reasons(router)
@@ -0,0 +1,88 @@
+import asyncio
+
+from outbound import OutboundBatcher
+
+
+class Sink:
+    def __init__(self, fail: bool = False):
+        self.frames: list[dict] = []
+        self.fail = fail
+
+    async def send(self, frame: dict) -> None:
+        if self.fail:
+            raise RuntimeError("socket closed")
+        self.frames.append(frame)
+
+
+def transcript(text: str) -> list[dict]:
+    return [{"type": "transcript", "text": text}]
+
+
+def test_transcript_fragments_merge_within_the_window():
+    async def scenario():
+        sink = Sink()
+        batcher = OutboundBatcher(sink.send, window=0.05)
+        await batcher.push(transcript("こん"))
+        await batcher.push(transcript("にちは"))
+        assert sink.frames == []
+        await asyncio.sleep(0.1)
+        return sink
+
+    sink = asyncio.run(scenario())
+    assert sink.frames == [{"type": "transcript", "text": "こんにちは"}]
+
+
+def test_audio_flushes_held_fragments_ahead_of_itself():
+    async def scenario():
+        sink = Sink()
+        batcher = OutboundBatcher(sink.send, window=10)
+        await batcher.push(transcript("a"))
+        await batcher.push(transcript("b"))
+        await batcher.push([{"type": "audio", "audio": "AAAA"}])
+        await batcher.push(transcript("c"))
+        await batcher.push([{"type": "turn_complete"}])
+        return sink, batcher
+
+    sink, batcher = asyncio.run(scenario())
+    assert sink.frames == [
+        {
+            "type": "batch",
+            "events": [
+                {"type": "transcript", "text": "ab"},
+                {"type": "audio", "audio": "AAAA"},
+            ],
+        },
+        {
+            "type": "batch",
+            "events": [
+                {"type": "transcript", "text": "c"},
+                {"type": "turn_complete"},
+            ],
+        },
+    ]
+    assert batcher.events_in == 5
+    assert batcher.frames_out == 2
+
+
+def test_single_event_is_sent_unwrapped():
+    async def scenario():
+        sink = Sink()
+        batcher = OutboundBatcher(sink.send, window=10)
+        await batcher.push([{"type": "interrupted"}])
+        return sink
+
+    assert asyncio.run(scenario()).frames == [{"type": "interrupted"}]
+
+
+def test_close_after_a_failed_send():
+    async def scenario():
+        sink = Sink(fail=True)
+        batcher = OutboundBatcher(sink.send, window=10)
+        await batcher.push(transcript("held"))
+        await batcher.close()
+        await batcher.push(transcript("more"))
+        await batcher.close()
+        return batcher
+
+    batcher = asyncio.run(scenario())
+    assert batcher.pending == 0
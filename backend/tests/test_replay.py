@@ -0,0 +1,26 @@
+import json
+
+from fake_upstream import _echo
+from relay import realtime_input
+from replay import with_replay_name
+
+
+def test_recorded_config_frame_gets_the_replay_name():
+    frames = [(0.0, json.dumps({"type": "config", "userName": "太郎"})), (0.1, "x")]
+    first, second = with_replay_name(frames, "replay-0")
+    assert json.loads(first[1]) == {"type": "config", "userName": "replay-0"}
+    assert second == (0.1, "x")
+
+
+def test_config_is_prepended_when_the_recording_lacks_one():
+    audio = json.dumps({"type": "audio", "audio": "AAAA"})
+    frames = with_replay_name([(0.2, audio)], "replay-1")
+    assert json.loads(frames[0][1]) == {"type": "config", "userName": "replay-1"}
+    assert frames[1:] == [(0.2, audio)]
+
+
+def test_echo_ignores_frames_without_realtime_input():
+    assert _echo(json.dumps({"clientContent": {"turnComplete": True}})) is None
+    reply = json.loads(_echo(realtime_input("AAAA")))
+    part = reply["serverContent"]["modelTurn"]["parts"][0]
+    assert part["inlineData"]["data"] == "AAAA"
@@ -0,0 +1,32 @@
+from google.genai import types
+
+from usage import UsageMeter, genai_usage, live_usage
+
+
+def test_genai_usage_records_thoughts_and_tool_use_prompt():
+    response = types.GenerateContentResponse(
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=10,
+            candidates_token_count=4,
+            thoughts_token_count=120,
+            tool_use_prompt_token_count=6,
+        )
+    )
+    usage = genai_usage(response)
+    assert usage == {
+        ("prompt", "all"): 10,
+        ("response", "all"): 4,
+        ("thoughts", "all"): 120,
+        ("tool_use_prompt", "all"): 6,
+    }
+
+    meter = UsageMeter()
+    meter.record("chat", usage, "u1")
+    assert meter.for_uid("u1")["thoughts"] == {"all": 120}
+
+
+def test_live_usage_without_thoughts_keeps_two_directions():
+    usage = live_usage(
+        {"usageMetadata": {"promptTokenCount": 3, "responseTokenCount": 2}}
+    )
+    assert usage == {("prompt", "all"): 3, ("response", "all"): 2}
@@ -0,0 +1,148 @@
+"""Token accounting from the usage metadata Gemini returns.
+
+Every Live message and ``generate_content`` response that carries usage
+metadata is folded into per-uid, per-session and process-wide totals, keyed
+by direction and modality. Besides ``prompt`` and ``response``, thinking
+tokens are kept under ``thoughts`` and the prompt of tool calls under
+``tool_use_prompt``; both are billed but belong to neither of the others.
+
+Recording happens on the event loop and in worker threads (TTS warm-up runs
+``synthesize_speech`` through ``asyncio.to_thread``), so the counters sit
+behind one lock that is held only for a few dict updates. ``/metrics`` reads
+a copy at scrape time.
+"""
+
+import threading
+from collections import defaultdict
+
+from prometheus_client.core import CounterMetricFamily
+
+ANONYMOUS = "anonymous"
+
+# (direction, modality) -> tokens; modality "all" holds the direction total.
+Usage = dict[tuple[str, str], int]
+
+
+def _add_details(usage: Usage, direction: str, details) -> None:
+    for detail in details or []:
+        if isinstance(detail, dict):
+            modality, count = detail.get("modality"), detail.get("tokenCount")
+        else:
+            modality, count = detail.modality, detail.token_count
+        if modality is None or not count:
+            continue
+        # SDK enums (MediaModality.AUDIO) and raw strings ("AUDIO") alike.
+        name = getattr(modality, "value", modality)
+        usage[(direction, str(name).lower())] = count
+
+
+def live_usage(response: dict) -> Usage | None:
+    """Usage of one Gemini Live message, from its ``usageMetadata``.
+
+    Live reports usage alongside the turn it belongs to, so each message's
+    counts are added to the totals as they arrive.
+    """
+    metadata = response.get("usageMetadata")
+    if not metadata:
+        return None
+    usage: Usage = {
+        ("prompt", "all"): metadata.get("promptTokenCount", 0),
+        ("response", "all"): metadata.get("responseTokenCount", 0),
+    }
+    _add_details(usage, "prompt", metadata.get("promptTokensDetails"))
+    _add_details(usage, "response", metadata.get("responseTokensDetails"))
+    if metadata.get("thoughtsTokenCount"):
+        usage[("thoughts", "all")] = metadata["thoughtsTokenCount"]
+    if metadata.get("toolUsePromptTokenCount"):
+        usage[("tool_use_prompt", "all")] = metadata["toolUsePromptTokenCount"]
+        _add_details(
+            usage, "tool_use_prompt", metadata.get("toolUsePromptTokensDetails")
+        )
+    return usage
+
+
+def genai_usage(response) -> Usage | None:
+    """Usage of a ``generate_content``/chat response from the SDK."""
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is None:
+        return None
+    usage: Usage = {
+        ("prompt", "all"): metadata.prompt_token_count or 0,
+        ("response", "all"): metadata.candidates_token_count or 0,
+    }
+    _add_details(usage, "prompt", metadata.prompt_tokens_details)
+    _add_details(usage, "response", metadata.candidates_tokens_details)
+    if metadata.thoughts_token_count:
+        usage[("thoughts", "all")] = metadata.thoughts_token_count
+    if metadata.tool_use_prompt_token_count:
+        usage[("tool_use_prompt", "all")] = metadata.tool_use_prompt_token_count
+        _add_details(usage, "tool_use_prompt", metadata.tool_use_prompt_tokens_details)
+    return usage
+
+
+class UsageMeter:
+    """Token totals per uid, per live session and per call source."""
+
+    def __init__(self):
+        self._by_uid: defaultdict[str, defaultdict] = defaultdict(
+            lambda: defaultdict(int)
+        )
+        self._by_session: defaultdict[str, defaultdict] = defaultdict(
+            lambda: defaultdict(int)
+        )
+        # (source, direction, modality) -> tokens
+        self._totals: defaultdict[tuple[str, str, str], int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        source: str,
+        usage: Usage | None,
+        uid: str | None = None,
+        session_id: str | None = None,
+    ) -> None:
+        if not usage:
+            return
+        with self._lock:
+            per_uid = self._by_uid[uid or ANONYMOUS]
+            per_session = self._by_session[session_id] if session_id else None
+            for key, count in usage.items():
+                per_uid[key] += count
+                if per_session is not None:
+                    per_session[key] += count
+                self._totals[(source, *key)] += count
+
+    def end_session(self, session_id: str) -> None:
+        with self._lock:
+            self._by_session.pop(session_id, None)
+
+    @staticmethod
+    def _as_dict(usage) -> dict:
+        result: dict[str, dict[str, int]] = {}
+        for (direction, modality), count in usage.items():
+            result.setdefault(direction, {})[modality] = count
+        return result
+
+    def for_uid(self, uid: str) -> dict:
+        with self._lock:
+            return self._as_dict(self._by_uid.get(uid, {}))
+
+    def for_session(self, session_id: str) -> dict:
+        with self._lock:
+            return self._as_dict(self._by_session.get(session_id, {}))
+
+    def collect(self):
+        """Prometheus collector hook; reads the totals at scrape time."""
+        family = CounterMetricFamily(
+            "gemini_tokens",
+            "Tokens reported by Gemini usage metadata",
+            labels=["source", "direction", "modality"],
+        )
+        with self._lock:
+            totals = list(self._totals.items())
+        for (source, direction, modality), count in totals:
+            family.add_metric([source, direction, modality], count)
+        yield family
+
+
+usage_meter = UsageMeter()
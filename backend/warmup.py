@@ -0,0 +1,86 @@
+"""Process warm-up and readiness.
+
+``warm_up`` runs the per-frame audio code once so its first real call does
+not pay for lazy initialisation. It also pre-synthesizes the phrases in
+``WARMUP_FILLERS`` (``|`` separated) into ``warm_state.tts_cache``, which
+``synthesize_speech`` serves from. The list is empty by default: each phrase
+is a billed TTS call per boot and only pays off when clients request exactly
+that text.
+
+``serve.py`` runs it in the gunicorn master before workers fork, so every
+worker shares the warmed state copy-on-write and starts ready; under plain
+``uvicorn`` it runs in the background at start-up.
+
+``/readyz`` reports ready once warm-up has finished, whether or not every
+phrase could be synthesized.
+"""
+
+import base64
+import logging
+import os
+import time
+from collections.abc import Callable
+
+from relay import server_events
+
+logger = logging.getLogger(__name__)
+
+WARMUP_FILLERS = [
+    phrase.strip()
+    for phrase in os.getenv("WARMUP_FILLERS", "").split("|")
+    if phrase.strip()
+]
+
+
+class WarmState:
+    def __init__(self):
+        self.ready = False
+        # text -> (base64 audio, envelope), as returned by synthesize_speech
+        self.tts_cache: dict[str, tuple[str, dict | None]] = {}
+        self.seconds: float | None = None
+
+
+warm_state = WarmState()
+
+
+def warm_up(synthesize: Callable[[str], tuple[str, dict | None]]) -> None:
+    """Warms this process once; later calls return immediately."""
+    if warm_state.ready:
+        return
+    start = time.perf_counter()
+
+    # 200 ms of silence through the Live audio path (decode + envelope)
+    silence = base64.b64encode(bytes(9600)).decode("ascii")
+    server_events(
+        {
+            "serverContent": {
+                "modelTurn": {
+                    "parts": [
+                        {
+                            "inlineData": {
+                                "mimeType": "audio/pcm;rate=24000",
+                                "data": silence,
+                            }
+                        }
+                    ]
+                },
+                "turnComplete": True,
+            }
+        }
+    )
+
+    for phrase in WARMUP_FILLERS:
+        try:
+            warm_state.tts_cache[phrase] = synthesize(phrase)
+        except Exception as e:
+            logger.warning("Filler warm-up failed for %r: %s", phrase, e)
+
+    warm_state.seconds = time.perf_counter() - start
+    warm_state.ready = True
+    logger.info(
+        "Warm-up complete",
+        extra={
+            "fillers": len(warm_state.tts_cache),
+            "seconds": round(warm_state.seconds, 3),
+        },
+    )
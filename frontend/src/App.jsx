@@ -19,6 +19,26 @@ const MODE = {
     LFM: 'lfm' // LFM2.5Audio
 }
 
+// バックエンドが音声と一緒に送る口形状エンベロープ (0-255, -60..0 dBFS) の開口しきい値
+const ENVELOPE_MOUTH_OPEN_LEVEL = 110
+
+// { fps, levels: base64 } -> { fps, levels: Uint8Array }
+const decodeEnvelope = (envelope) => {
+    if (!envelope || !envelope.levels) return null
+    return { fps: envelope.fps, levels: Uint8Array.from(atob(envelope.levels), c => c.charCodeAt(0)) }
+}
+
+// ログイン中ならIDトークンを付ける (サーバー側のトークン集計用)
+const authHeaders = async () => {
+    if (!auth.currentUser) return {}
+    try {
+        return { Authorization: `Bearer ${await auth.currentUser.getIdToken()}` }
+    } catch (e) {
+        console.error("Failed to get token", e)
+        return {}
+    }
+}
+
 const STATUS_LABELS = {
     [STATE.INIT]: 'マイクを有効化してください',
     [STATE.CONNECTING]: '接続中...',
@@ -235,6 +255,9 @@ function App() {
 
     const streamRef = useRef(null)
     const playbackQueueRef = useRef([])
+    const envelopesRef = useRef(new WeakMap()) // Float32Array chunk -> decoded envelope
+    const mouthTimersRef = useRef([])
+    const serverUsageRef = useRef(false) // サーバーから実トークン数が届いたら推定をやめる
 
     const isPlayingRef = useRef(false)
     const conversationHistoryRef = useRef(conversationHistory) // Sync ref for callbacks
@@ -384,6 +407,7 @@ function App() {
 
             const res = await fetch('/api/speech-to-speech', {
                 method: 'POST',
+                headers: await authHeaders(),
                 body: formData
             })
 
@@ -417,6 +441,7 @@ function App() {
 
             // Split into manageable chunks if needed, or push strictly one.
             playbackQueueRef.current.push(float32Data)
+            if (data.envelope) envelopesRef.current.set(float32Data, decodeEnvelope(data.envelope))
 
             // Update History & Subtitles with Transcript
             if (data.transcript) {
@@ -507,71 +532,87 @@ function App() {
 
         ws.onmessage = async (event) => {
             try {
-                const data = JSON.parse(event.data)
-
-                if (data.type === 'audio') {
-                    // Geminiからの音声データを受信 (PCM 16kHz/24kHz depends on model, usually 24kHz for output in Live API?)
-                    // The Live API beta often returns 24kHz PCM.
-                    const audioData = Uint8Array.from(atob(data.audio), c => c.charCodeAt(0))
-
-                    // Convert to Float32 immediately
-                    const int16Array = new Int16Array(audioData.buffer)
-                    const float32Array = new Float32Array(int16Array.length)
-                    for (let i = 0; i < int16Array.length; i++) {
-                        float32Array[i] = int16Array[i] / 32768.0
-                    }
-                    playbackQueueRef.current.push(float32Array)
-
-                    // 出力トークンをカウント (24kHz assumed for Live API)
-                    const tokens = estimateTokens(audioData.length, 24000)
-                    setTokenStats(prev => ({ ...prev, liveOutput: prev.liveOutput + tokens }))
+                const message = JSON.parse(event.data)
+                // 同じ上流メッセージ由来のイベントはまとめて届く (type: 'batch')
+                const events = message.type === 'batch' ? message.events : [message]
+
+                for (const data of events) {
+                    if (data.type === 'audio') {
+                        // Geminiからの音声データを受信 (PCM 16kHz/24kHz depends on model, usually 24kHz for output in Live API?)
+                        // The Live API beta often returns 24kHz PCM.
+                        const audioData = Uint8Array.from(atob(data.audio), c => c.charCodeAt(0))
+
+                        // Convert to Float32 immediately
+                        const int16Array = new Int16Array(audioData.buffer)
+                        const float32Array = new Float32Array(int16Array.length)
+                        for (let i = 0; i < int16Array.length; i++) {
+                            float32Array[i] = int16Array[i] / 32768.0
+                        }
+                        playbackQueueRef.current.push(float32Array)
+                        if (data.envelope) envelopesRef.current.set(float32Array, decodeEnvelope(data.envelope))
 
-                    if (!isPlayingRef.current) {
-                        playAudioQueue()
-                    }
-                } else if (data.type === 'interrupted') {
-                    // 割り込み - キューをクリアして停止
-                    playbackQueueRef.current = []
-                    isPlayingRef.current = false
-                    setCurrentResponse('')
-                    setSubtitle('')
-                    setMouthOpen(false)
-                    setAppState(STATE.READY)
-                    console.log('Interrupted by user')
-                } else if (data.type === 'text') {
-                    // model_turn.parts[].text は思考過程なので、思考中状態にする
-                    setAppState(STATE.THINKING)
-                    console.log('[Thinking]', data.text)
-                } else if (data.type === 'transcript') {
-                    // AI発話開始時にユーザー発話を履歴に保存
-                    setCurrentUserTranscript(prev => {
-                        if (prev.trim()) {
-                            setConversationHistory(history => [
-                                ...history,
-                                { role: 'user', text: prev.trim(), timestamp: new Date() }
-                            ])
+                        // 出力トークンをカウント (24kHz assumed for Live API)
+                        if (!serverUsageRef.current) {
+                            const tokens = estimateTokens(audioData.length, 24000)
+                            setTokenStats(prev => ({ ...prev, liveOutput: prev.liveOutput + tokens }))
                         }
-                        return ''
-                    })
-                    // 確定字幕（実際に話した内容）- 累積して表示
-                    setSubtitle(prev => prev + data.text)
-                    setCurrentResponse(prev => prev + data.text)
-                } else if (data.type === 'user_transcript') {
-                    // ユーザーの発話文字起こし - 累積
-                    setCurrentUserTranscript(prev => prev + data.text)
-                } else if (data.type === 'turn_complete') {
-                    // Geminiのターン終了 - 履歴に追加
-                    setCurrentResponse(prev => {
-                        if (prev.trim()) {
-                            setConversationHistory(history => [
-                                ...history,
-                                { role: 'assistant', text: prev.trim(), timestamp: new Date() }
-                            ])
+
+                        if (!isPlayingRef.current) {
+                            playAudioQueue()
                         }
-                        return ''
-                    })
-                    setSubtitle('')
-                    setAppState(STATE.READY)
+                    } else if (data.type === 'interrupted') {
+                        // 割り込み - キューをクリアして停止
+                        playbackQueueRef.current = []
+                        clearMouthTimers()
+                        isPlayingRef.current = false
+                        setCurrentResponse('')
+                        setSubtitle('')
+                        setMouthOpen(false)
+                        setAppState(STATE.READY)
+                        console.log('Interrupted by user')
+                    } else if (data.type === 'text') {
+                        // model_turn.parts[].text は思考過程なので、思考中状態にする
+                        setAppState(STATE.THINKING)
+                        console.log('[Thinking]', data.text)
+                    } else if (data.type === 'transcript') {
+                        // AI発話開始時にユーザー発話を履歴に保存
+                        setCurrentUserTranscript(prev => {
+                            if (prev.trim()) {
+                                setConversationHistory(history => [
+                                    ...history,
+                                    { role: 'user', text: prev.trim(), timestamp: new Date() }
+                                ])
+                            }
+                            return ''
+                        })
+                        // 確定字幕（実際に話した内容）- 累積して表示
+                        setSubtitle(prev => prev + data.text)
+                        setCurrentResponse(prev => prev + data.text)
+                    } else if (data.type === 'user_transcript') {
+                        // ユーザーの発話文字起こし - 累積
+                        setCurrentUserTranscript(prev => prev + data.text)
+                    } else if (data.type === 'usage') {
+                        // Geminiが報告した実トークン数 (以降は推定値を使わない)
+                        serverUsageRef.current = true
+                        setTokenStats(prev => ({
+                            ...prev,
+                            liveInput: prev.liveInput + data.prompt_tokens,
+                            liveOutput: prev.liveOutput + data.response_tokens
+                        }))
+                    } else if (data.type === 'turn_complete') {
+                        // Geminiのターン終了 - 履歴に追加
+                        setCurrentResponse(prev => {
+                            if (prev.trim()) {
+                                setConversationHistory(history => [
+                                    ...history,
+                                    { role: 'assistant', text: prev.trim(), timestamp: new Date() }
+                                ])
+                            }
+                            return ''
+                        })
+                        setSubtitle('')
+                        setAppState(STATE.READY)
+                    }
                 }
             } catch (err) {
                 console.error('Message parse error:', err)
@@ -653,10 +694,12 @@ function App() {
 
                     // 入力トークン概算 (16kHz PCM 16bit)
                     // audioData is Int16Array, so byteLength is length * 2
-                    setTokenStats(prev => ({
-                        ...prev,
-                        liveInput: prev.liveInput + estimateTokens(audioData.byteLength)
-                    }))
+                    if (!serverUsageRef.current) {
+                        setTokenStats(prev => ({
+                            ...prev,
+                            liveInput: prev.liveInput + estimateTokens(audioData.byteLength)
+                        }))
+                    }
                 }
             }
 
@@ -736,7 +779,7 @@ function App() {
         try {
             const res = await fetch('/chat/text_to_audio', {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: { 'Content-Type': 'application/json', ...(await authHeaders()) },
                 body: JSON.stringify({
                     text: text,
                     history: historyToSend,
@@ -771,6 +814,7 @@ function App() {
                 console.log("Float32 samples:", float32Array.length) // LOG
 
                 playbackQueueRef.current.push(float32Array)
+                if (data.envelope) envelopesRef.current.set(float32Array, decodeEnvelope(data.envelope))
 
                 // Count Output Tokens (Audio)
                 // Approx estimate for now.
@@ -797,10 +841,31 @@ function App() {
     }
 
 
+    const clearMouthTimers = () => {
+        mouthTimersRef.current.forEach(clearTimeout)
+        mouthTimersRef.current = []
+    }
+
+    // サーバー計算済みエンベロープで口パクをスケジュール (再生中の解析は不要)
+    // 開閉が切り替わるフレームだけタイマーを張る
+    const scheduleMouthFromEnvelope = (envelope) => {
+        clearMouthTimers()
+        const frameMs = 1000 / envelope.fps
+        let open = null
+        envelope.levels.forEach((level, i) => {
+            const nextOpen = level >= ENVELOPE_MOUTH_OPEN_LEVEL
+            if (nextOpen !== open) {
+                open = nextOpen
+                mouthTimersRef.current.push(setTimeout(() => setMouthOpen(nextOpen), i * frameMs))
+            }
+        })
+    }
+
     // 音声再生キュー処理 (Float32Array base)
     const playAudioQueue = async () => {
         if (playbackQueueRef.current.length === 0) {
             isPlayingRef.current = false
+            clearMouthTimers()
             setMouthOpen(false)
             // If Standard Mode, maybe restart listening here?
             if (mode === MODE.STANDARD && appState !== STATE.ERROR) {
@@ -872,6 +937,17 @@ function App() {
             const source = audioContext.createBufferSource()
             source.buffer = audioBuffer
 
+            const envelope = envelopesRef.current.get(float32Array)
+            if (envelope) {
+                source.connect(audioContext.destination)
+                source.onended = () => {
+                    playAudioQueue()
+                }
+                source.start()
+                scheduleMouthFromEnvelope(envelope)
+                return
+            }
+
             // Connect to existing analyser if present, or create one.
             // In Live Mode, analyser is connected to Mic Input.
             // We want it connected to Output for Avatar Speaking visualization?
@@ -1006,6 +1082,7 @@ function App() {
 
         // 再生キュークリア
         playbackQueueRef.current = []
+        clearMouthTimers()
         isPlayingRef.current = false
 
         // 状態リセット